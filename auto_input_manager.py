@@ -1,45 +1,147 @@
-import json
-import sys
 from random import random as rand
-from pynput import keyboard, mouse
-import pydirectinput
 import time
-from typing import Dict, List, Union, Optional
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
 import threading
-import ctypes
-import psutil
 import os
+from config_compiler import (ConfigError, CompiledTrigger, compile_config, MOD_ALT, MOD_CTRL, MOD_SHIFT, MOD_WIN,
+                             MODIFIER_COMBINATIONS, normalize_process_name, OP_DELAY, OP_MOUSE_PATH, OP_REPEAT,
+                             OP_REPEAT_END, parse_trigger_key)
+from combo_matcher import ComboMatcher
+from key_ledger import KeyLedger
+from foreground import ForegroundProvider, ForegroundResolver, WindowsForegroundProvider
+from config_cache import apply_includes, include_paths, load_config_file, parse_config_bytes, save_cache
+from macro_scheduler import Activation, MacroScheduler
+from output_backend import OutputBackend, PyDirectInputBackend
+from metrics import MetricsRegistry
+from log_pipeline import (LOG_ACTION, LOG_ALREADY_PRESSED, LOG_DELAY, LOG_ERROR, LOG_KEY_DOWN, LOG_KEY_UP, LOG_MOUSE,
+                          LOG_PAUSED, LOG_TRIGGER, LOG_TRIGGER_STOP, LogPipeline)
+
+# precise 模式下落后计划时间超过该值时不再追赶，直接以当前时间为基准重新对齐
+PRECISE_MAX_LAG = 0.05
+# 重复块中连续执行这么多轮而没有遇到延时时让出调度器一次，使其他宏与取消得以执行
+REPEAT_YIELD_INTERVAL = 64
+# 停止时等待宏结束与监听器退出的总时长上限，超时后强制松开按键并报告未结束的宏，单位为秒
+STOP_TIMEOUT = 0.05
+# 检查配置文件是否被修改的间隔，单位为秒
+CONFIG_WATCH_INTERVAL = 0.5
+# 前台进程轮询间隔的范围：有输入后使用最短间隔，空闲时逐次加倍直到最长间隔
+FOREGROUND_POLL_MIN = 0.05
+FOREGROUND_POLL_MAX = 0.5
+# 最近一次输入后保持最短轮询间隔的时长，单位为秒
+FOREGROUND_ACTIVE_WINDOW = 2.0
+# pynput.keyboard.Key 中的修饰键及其位掩码
+MODIFIER_KEYS = (
+    ('ctrl', MOD_CTRL), ('ctrl_l', MOD_CTRL), ('ctrl_r', MOD_CTRL),
+    ('shift', MOD_SHIFT), ('shift_l', MOD_SHIFT), ('shift_r', MOD_SHIFT),
+    ('alt', MOD_ALT), ('alt_l', MOD_ALT), ('alt_r', MOD_ALT), ('alt_gr', MOD_ALT),
+    ('cmd', MOD_WIN), ('cmd_l', MOD_WIN), ('cmd_r', MOD_WIN),
+)
+# 暂停/恢复快捷键 Ctrl+Shift+X
+PAUSE_MODIFIERS = MOD_CTRL | MOD_SHIFT
+PAUSE_KEY = 'x'
+
+
+class DispatchTable(NamedTuple):
+    """一个 profile 的分发索引：(修饰键掩码, 字符 / pynput 特殊键 / pynput 鼠标按键) -> (触发器, 处理函数)
+
+    每种修饰键组合都有独立的索引项：组合键只登记在自己的掩码下。不带修饰键的键盘触发器默认只登记在掩码 0 下，
+    配置 "ignore_modifiers": true 时与鼠标触发器一样登记在所有没有同键组合键的掩码下，按住修饰键时照常响应。
+    每个事件只需一次查找。
+    """
+    # 所属 profile 的进程名，顶层触发器为空字符串，None 表示前台进程不匹配、不响应任何触发
+    profile: Optional[str]
+    key_index: dict
+    mouse_index: dict
+    # 该 profile 的按键序列触发器，没有时为 None
+    combos: Optional[ComboMatcher] = None
+
+
+BLOCKED_TABLE = DispatchTable(None, {}, {})
 
-# LAST_TIME = time.perf_counter()
-MOUSE_BUTTON = set(['left', 'right', 'middle', 'x1', 'x2'])
 
 class AutoInputManager:
-    def __init__(self, config_path: str, open_log: bool, process_name: Optional[str] = None):
+    def __init__(self, config_path: str, open_log: bool, process_name: Optional[str] = None,
+                 backend: Optional[OutputBackend] = None, log_sinks: Optional[List[Callable[[str], None]]] = None,
+                 collect_metrics: bool = False, watch_config: bool = True, use_cache: bool = True,
+                 foreground_provider: Optional[ForegroundProvider] = None,
+                 clock: Callable[[], float] = time.perf_counter, input_types: Optional[tuple] = None):
         self.config_path = config_path
-        self.config = self.load_config()
+        # 宏调度、延时与钩子时间戳使用的时钟，模拟回放时替换为虚拟时钟
+        self._clock = clock
+        # 监听回调收到的 (特殊键类型, 鼠标按键类型)，默认在第一次使用时从 pynput 导入
+        self._input_types = input_types
+        # 编译结果缓存在配置文件旁，内容未变化时跳过解析与校验
+        self.use_cache = use_cache
+        self.config, self.triggers = self.load_config()
+        # 运行期间配置文件被修改时自动增量重新加载
+        self.watch_config = watch_config
+        self._config_stamp = self._get_config_stamp()
         self.open_log = open_log
-        # 如果指定了进程名，标准化存储（小写，去掉可能的 .exe 后缀）
+        # 所有键鼠注入都经过输出后端，默认使用 pydirectinput
+        self.backend = backend if backend is not None else PyDirectInputBackend()
+        # 运行期日志由后台线程格式化输出，默认写到控制台
+        self.log = LogPipeline(log_sinks)
+        # 按触发器统计延迟直方图，stop() 时输出
+        self.metrics = MetricsRegistry() if collect_metrics else None
+        # 如果指定了进程名，标准化存储（小写，去掉可能的 .exe 后缀）；命令行指定的进程名不随配置重新加载改变
+        self._process_override = process_name
         process = process_name if process_name else self.config.get('process', None)
-        self.process_name = self._normalize_process_name(process) if process else None
+        self.process_name = normalize_process_name(process) if process else None
+        self.monitor_thread = None
         self.keyboard_listener = None
         self.mouse_listener = None
         
-        self._ctrl_pressed = False
-        self._shift_pressed = False
+        # 当前按下的修饰键位掩码，由键盘钩子线程维护；鼠标钩子线程只读取
+        self._modifiers = 0
+        self._held_modifiers: Dict[object, int] = {}
+        # pynput 修饰键对象 -> 位掩码，安装钩子时才导入 pynput（指定了 input_types 时使用其中的特殊键类型）
+        self._modifier_keys: Dict[object, int] = self._build_modifier_keys(input_types[0]) if input_types else {}
 
         self._is_running = threading.Event()
+        # stop() 时置位，使 start() 的主循环立即返回
+        self._stop_requested = threading.Event()
         self._events_paused = threading.Event()
         
         self._loops_lock = threading.Lock()  # 保护 active_loops
-        self._keys_lock = threading.Lock()   # 保护 pressed_keys
-        self.active_loops = {}
-        self.pressed_keys = set()
-
-        self.active_threads = []  # 追踪所有活动的线程
-        self.thread_lock = threading.Lock()  # 线程列表的同步锁
-        # 前台进程匹配缓存与锁（由后台监视线程更新）
-        self._foreground_lock = threading.Lock()
-        self._foreground_matches = True if not self.process_name else self._is_foreground_process()
+        self.active_loops: Dict[str, Activation] = {}
+        # 按下时匹配到的索引项，抬起时交给同一个触发器处理，与抬起时的修饰键状态无关；
+        # 分别只在键盘 / 鼠标钩子线程中访问，同时用于过滤按住时系统产生的重复按下事件
+        self.pressed_keys: Dict[object, tuple] = {}
+        self._pressed_buttons: Dict[object, tuple] = {}
+        # 前台进程解析，未指定提供者时在第一次查询时创建 Windows 提供者
+        self._foreground_provider = foreground_provider
+        self._foreground_resolver: Optional[ForegroundResolver] = None
+        # 钩子线程记录最近一次输入的时间；监视线程处于最长轮询间隔时由钩子唤醒
+        self._last_input_time = 0.0
+        self._foreground_idle = False
+        self._foreground_wake = threading.Event()
+        # 监听回调使用的分发索引，在加载时按 profile 一次性构建：进程名 -> DispatchTable，
+        # 前台进程不在其中时使用 _fallback_table
+        self._tables, self._fallback_table = self._build_dispatch_tables(self.triggers, self.config)
+        # 当前生效的分发索引，由后台监视线程在前台进程变化时整体替换
+        self._foreground_name = self._get_foreground_process_name() if self._tables else None
+        self._dispatch = self._tables.get(self._foreground_name, self._fallback_table)
+
+        # 所有宏由同一个调度线程驱动
+        self.scheduler = MacroScheduler(self._step_activation, self._on_activation_error, clock)
+        # 所有激活共用的按键引用计数，只在第一个持有者按下、最后一个持有者松开时注入
+        self.key_ledger = KeyLedger()
+        self._timer_period_set = False
+
+        # 以操作码为下标的处理函数表，见 config_compiler
+        self._op_handlers = (
+            self._op_key_down,
+            self._op_key_up,
+            self._op_key_click,
+            self._op_mouse_down,
+            self._op_mouse_up,
+            self._op_mouse_click,
+            self._op_mouse_move,
+            self._op_mouse_move_rel,
+            None,  # OP_DELAY 由 _step_activation 直接处理
+            self._op_batch,
+            # OP_MOUSE_PATH、OP_REPEAT、OP_REPEAT_END 由 _step_activation 直接处理
+        )
 
     @property
     def is_running(self):
@@ -49,304 +151,716 @@ class AutoInputManager:
     def events_paused(self):
         return self._events_paused.is_set()
 
-    def load_config(self) -> dict:
-        """加载配置文件"""
+    def load_config(self) -> Tuple[dict, Dict[str, CompiledTrigger]]:
+        """加载配置文件并编译所有触发器；配置无效时抛出 ConfigError，文件无法读取或解析时抛出原始异常，由调用方提示"""
+        config, triggers, _cached = load_config_file(self.config_path, self.use_cache)
+        return config, triggers
+
+    def _get_config_stamp(self) -> Optional[tuple]:
+        """配置文件及其 include 的宏文件的修改时间与大小"""
         try:
-            with open(self.config_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            print(f"加载配置文件失败: {e}")
-            sys.exit(1)
-
-    def _normalize_process_name(self, name: str) -> str:
-        """标准化进程名用于比较：小写，去掉 .exe 后缀（如果有）"""
-        if not name:
-            return name
-        base = os.path.basename(name).lower()
-        if base.endswith('.exe'):
-            base = base[:-4]
-        return base
-
-    def _get_foreground_pid(self) -> Optional[int]:
-        """使用 Windows API 获取前台窗口对应的进程 id。"""
+            paths = [self.config_path] + include_paths(self.config, self.config_path)
+        except ConfigError:
+            paths = [self.config_path]
+        stamp = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return None
+            stamp.append((stat.st_mtime_ns, stat.st_size))
+        return tuple(stamp)
+
+    def _check_config_changed(self):
+        stamp = self._get_config_stamp()
+        if stamp is not None and stamp != self._config_stamp:
+            self._config_stamp = stamp
+            self.reload_config()
+
+    def reload_config(self) -> bool:
+        """重新读取配置文件，只重新编译发生变化的触发器并原子地替换分发索引。
+
+        未变化的触发器沿用原来的编译结果，正在执行的激活不受影响；被修改或删除的
+        触发器中仍在运行的 hold/toggle 循环会被取消。配置无效时保留原配置。
+        """
+        start = time.perf_counter()
         try:
-            hwnd = ctypes.windll.user32.GetForegroundWindow()
-            pid = ctypes.c_ulong()
-            ctypes.windll.user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
-            return pid.value
-        except Exception:
-            return None
+            with open(self.config_path, 'rb') as f:
+                data = f.read()
+            config = parse_config_bytes(data)
+            includes = apply_includes(config, self.config_path)
+            triggers = compile_config(config, self.config, self.triggers)
+        except Exception as e:
+            self.log.text(f'重新加载配置失败，继续使用原配置: {e}')
+            return False
+        if self.use_cache:
+            save_cache(self.config_path, data, config, triggers, includes)
+
+        old_triggers = self.triggers
+        added = [name for name in triggers if name not in old_triggers]
+        changed = [name for name, trigger in triggers.items()
+                   if name in old_triggers and old_triggers[name] is not trigger]
+        removed = [name for name in old_triggers if name not in triggers]
+
+        if not self._process_override:
+            process = config.get('process', None)
+            self.process_name = normalize_process_name(process) if process else None
+        tables, fallback_table = self._build_dispatch_tables(triggers, config)
+        self.config = config
+        self.triggers = triggers
+        # include 列表可能变化，按新配置重新记录监视的文件
+        self._config_stamp = self._get_config_stamp()
+        self._tables = tables
+        self._fallback_table = fallback_table
 
-    def _get_foreground_process_name(self) -> Optional[str]:
-        pid = self._get_foreground_pid()
-        if not pid:
-            return None
-        try:
-            proc = psutil.Process(pid)
-            return self._normalize_process_name(proc.name())
-        except Exception:
-            return None
+        with self._loops_lock:
+            for name in changed + removed:
+                activation = self.active_loops.pop(name, None)
+                if activation:
+                    self.scheduler.cancel(activation)
+
+        table = tables.get(self._foreground_name, fallback_table)
+        if table.profile != self._dispatch.profile:
+            self._switch_dispatch(table)
+        else:
+            self._dispatch = table
+        self._start_foreground_monitor()
+
+        self.log.text(f'配置已重新加载，耗时 {(time.perf_counter() - start) * 1000:.2f}ms：'
+                      f'新增 {len(added)}，修改 {len(changed)}，删除 {len(removed)}')
+        return True
 
-    def _is_foreground_process(self) -> bool:
-        """判断当前前台进程名是否与指定的 process_name 匹配（如果未指定 process_name 则返回 True）。"""
-        if not self.process_name:
-            return True
-        fg = self._get_foreground_process_name()
-        if not fg:
-            return False
-        return fg == self.process_name
+    def _get_foreground_process_name(self) -> Optional[str]:
+        resolver = self._foreground_resolver
+        if resolver is None:
+            # 只有配置了 process 或 profiles 时才会走到这里，Windows API 延迟到此时加载
+            try:
+                provider = self._foreground_provider or WindowsForegroundProvider()
+            except Exception:
+                return None
+            resolver = self._foreground_resolver = ForegroundResolver(provider)
+        return resolver.resolve()
 
     def _is_blocked(self) -> bool:
-        """当 events 被暂停或前台进程不是指定进程时，视为被阻塞（相当于暂停）。"""
-        # 使用缓存的前台匹配结果以避免在事件回调线程中执行阻塞/慢操作
-        if not self.process_name:
-            return self.events_paused
-        with self._foreground_lock:
-            fg_ok = self._foreground_matches
-        return self.events_paused or not fg_ok
+        """events 被暂停时视为被阻塞；前台进程不匹配时当前分发索引为空，不需要在这里判断"""
+        return self.events_paused
 
-    def execute_action(self, action: dict, press_keys: Dict[str, bool]):
-        """执行单个动作"""
-        if self.open_log:
-            print(f'执行动作: {action.get('type')}, {action.get('action', None)}')
-
-        action_type = action.get('type')
-        if action_type == 'keyboard':
-            key = action.get('key')
-            if action.get('action') == 'press':
-                if key not in press_keys:
-                    pydirectinput.keyDown(key, _pause=False)
-                    press_keys[key] = True
-                elif self.open_log:
-                    print(f'按键已按下，未重复触发: {key}')
-            elif action.get('action') == 'release':
-                pydirectinput.keyUp(key, _pause=False)
-                press_keys.pop(key, None)
-            elif action.get('action') == 'click':
-                pydirectinput.press(key, _pause=False)
-        elif action_type == 'mouse':
-            key = action.get('key')
-            if action.get('action') == 'click':
-                pydirectinput.click(button=key, _pause=False)
-            elif action.get('action') == 'press':
-                if key not in press_keys:
-                    pydirectinput.mouseDown(button=key, _pause=False)
-                    press_keys[key] = True
-                elif self.open_log:
-                    print(f'按键已按下，未重复触发: {key}')
-            elif action.get('action') == 'release':
-                pydirectinput.mouseUp(button=key, _pause=False)
-                press_keys.pop(key, None)
-        elif action_type == 'delay':
-            random = action.get('random', 0)
-            time.sleep(action.get('duration', 0.1) + random * rand())
-
-    def execute_actions(self, actions: List[dict], press_keys: Dict[str, bool]):
-        """执行一系列动作"""
-        # global LAST_TIME
-        # print(f'大循环间隔用时: {time.perf_counter() - LAST_TIME}')
-        for action in actions:
-            # LAST_TIME = time.perf_counter()
-            self.execute_action(action, press_keys)
-            # print(f'步骤用时: {time.perf_counter() - LAST_TIME}')
-            # LAST_TIME = time.perf_counter()
-
-    def wrap_thread_function(self, func, *args):
-        """包装线程函数，确保线程完成后从活动线程列表中移除"""
-        def wrapper():
-            try:
-                func(*args)
-            except Exception as e:
-                if self.open_log:
-                    print(f"线程执行出错: {e}")
-            finally:
-                current_thread = threading.current_thread()
-                with self.thread_lock:
-                    if current_thread in self.active_threads:
-                        self.active_threads.remove(current_thread)
-        return wrapper
-
-    def _trigger_action(self, actions: List[dict]):
-        # 一次性触发不需要锁
-        press_keys = {}
-        self.execute_actions(actions, press_keys)
-        for key in press_keys.keys():
-            if key in MOUSE_BUTTON:
-                pydirectinput.mouseUp(button=key, _pause=False)
+    def _acquire(self, key, slot, press_keys: dict) -> bool:
+        """当前激活按下 slot，返回是否需要注入按下事件（其他激活已按住时不重复注入）"""
+        if slot in press_keys:
+            if self.open_log:
+                self.log.emit(LOG_ALREADY_PRESSED, key)
+            return False
+        send, press_keys[slot] = self.key_ledger.press(slot)
+        return send
+
+    def _release(self, slot, press_keys: dict) -> bool:
+        """当前激活松开 slot，返回是否需要注入松开事件（其他激活仍按住时跳过）"""
+        epoch = press_keys.pop(slot, None)
+        if epoch is None:
+            # 不是本激活按下的键：没有宏按住时照常松开（例如松开用户按住的键）
+            return not self.key_ledger.is_held(slot)
+        return self.key_ledger.release(slot, epoch)
+
+    def _op_key_down(self, key, slot, press_keys: dict):
+        if self._acquire(key, slot, press_keys):
+            self.backend.key_down(key)
+
+    def _op_key_up(self, key, slot, press_keys: dict):
+        if self._release(slot, press_keys):
+            self.backend.key_up(key)
+
+    def _op_key_click(self, key, slot, press_keys: dict):
+        self.backend.key_click(key)
+
+    def _op_mouse_down(self, key, slot, press_keys: dict):
+        if self._acquire(key, slot, press_keys):
+            self.backend.mouse_down(key)
+
+    def _op_mouse_up(self, key, slot, press_keys: dict):
+        if self._release(slot, press_keys):
+            self.backend.mouse_up(key)
+
+    def _op_mouse_click(self, key, slot, press_keys: dict):
+        self.backend.mouse_click(key)
+
+    def _op_mouse_move(self, position, _extra, press_keys: dict):
+        self.backend.mouse_move(position)
+
+    def _op_mouse_move_rel(self, delta, _extra, press_keys: dict):
+        self.backend.mouse_move_rel(delta)
+
+    def _op_batch(self, entries, _extra, press_keys: dict):
+        events = []
+        for code, key, slot, kind in entries:
+            if kind > 0:
+                if not self._acquire(key, slot, press_keys):
+                    continue
+            elif kind < 0:
+                if not self._release(slot, press_keys):
+                    continue
+            events.append((code, key))
+        if events:
+            self.backend.send_batch(events)
+
+    def _step_activation(self, activation: Activation, now: float) -> Optional[float]:
+        """推进激活直到遇到延时或程序结束，返回下一次恢复的截止时间"""
+        program = activation.program
+        press_keys = activation.press_keys
+        handlers = self._op_handlers
+        open_log = self.open_log
+        metrics = activation.metrics
+        if open_log and activation.delay_requested is not None:
+            # 被取消而提前唤醒的延时不计入耗时统计
+            if not activation.cancelled:
+                self.log.emit(LOG_DELAY, activation.delay_requested, activation.delay_start, now, activation.deadline)
+            activation.delay_requested = None
+        repeats = 0
+        while True:
+            if activation.cancelled:
+                # 每个动作前检查取消，松开已按下的按键后立即结束
+                self._finish_activation(activation)
+                return None
+            pc = activation.pc
+            if pc >= len(program):
+                if activation.loop and self.is_running:
+                    # 一轮结束，让出调度器后立即开始下一轮
+                    activation.pc = 0
+                    if metrics is not None:
+                        current = self._clock()
+                        metrics.loop_period.record(current - activation.loop_start)
+                        activation.loop_start = current
+                    return activation.deadline if activation.precise else now
+                self._finish_activation(activation)
+                return None
+
+            code, arg, extra, desc = program[pc]
+            activation.pc = pc + 1
+            if code == OP_MOUSE_PATH:
+                # 路径逐点发送，每个点之间等待 interval；未发送完时停留在本操作上
+                path = activation.path
+                if path is None:
+                    if open_log:
+                        self.log.emit(LOG_ACTION, desc)
+                    start, paths = arg
+                    path = paths[int(rand() * len(paths))] if len(paths) > 1 else paths[0]
+                    activation.path = path
+                    activation.path_index = 0
+                    if start is not None:
+                        self.backend.mouse_move(start)
+                else:
+                    index = activation.path_index
+                    if arg[0] is None:
+                        self.backend.mouse_move_rel(path[index])
+                    else:
+                        self.backend.mouse_move(path[index])
+                    activation.path_index = index = index + 1
+                    if index >= len(path):
+                        activation.path = None
+                        continue
+                activation.pc = pc
+                return self._delay_deadline(activation, extra)
+            if code == OP_REPEAT_END:
+                counters = activation.repeat_counters
+                remaining = counters[-1] - 1
+                if remaining > 0:
+                    counters[-1] = remaining
+                    activation.pc = arg
+                    repeats += 1
+                    if repeats >= REPEAT_YIELD_INTERVAL:
+                        # 没有延时的重复块不能独占调度线程，以当前时间重新入堆
+                        return now
+                else:
+                    counters.pop()
+                continue
+            if open_log:
+                self.log.emit(LOG_ACTION, desc)
+            if code == OP_DELAY:
+                duration = arg + extra * rand()
+                deadline = self._delay_deadline(activation, duration)
+                if open_log:
+                    activation.delay_start = self._clock()
+                    activation.delay_requested = duration
+                return deadline
+            if code == OP_REPEAT:
+                if arg:
+                    activation.repeat_counters.append(arg)
+                else:
+                    activation.pc = extra
+                continue
+            if metrics is None:
+                handlers[code](arg, extra, press_keys)
             else:
-                pydirectinput.keyUp(key, _pause=False)
+                start = self._clock()
+                if activation.first_pending:
+                    activation.first_pending = False
+                    metrics.handler_to_injection.record(start - activation.started)
+                handlers[code](arg, extra, press_keys)
+                metrics.action.record(self._clock() - start)
+
+    def _delay_deadline(self, activation: Activation, duration: float) -> float:
+        """计算延时 duration 后的截止时间并记录到 activation"""
+        current = self._clock()
+        if activation.precise:
+            # 以上一次的计划时间为基准，抵消唤醒超时与动作耗时带来的漂移
+            deadline = activation.deadline + duration
+            if deadline < current - PRECISE_MAX_LAG:
+                deadline = current + duration
+        else:
+            deadline = current + duration
+        activation.deadline = deadline
+        return deadline
+
+    def _finish_activation(self, activation: Activation):
+        self._release_keys(activation.press_keys)
+        if activation.loop:
+            with self._loops_lock:
+                if self.active_loops.get(activation.trigger_key) is activation:
+                    del self.active_loops[activation.trigger_key]
+
+    def _on_activation_error(self, activation: Activation, error: Exception):
+        if self.open_log:
+            self.log.emit(LOG_ERROR, error)
+        self._finish_activation(activation)
+
+    def _clear_loops(self):
+        """取消所有循环触发"""
+        with self._loops_lock:
+            for activation in self.active_loops.values():
+                self.scheduler.cancel(activation)
+            self.active_loops.clear()
 
-    def _foreground_monitor(self, interval: float = 0.5):
-        prev = None
+    def _cancel_all(self, stopping: bool = False):
+        """取消所有正在执行的宏（包括 once），各激活在调度线程的下一步中松开自己按住的键
+
+        stopping 为 True 时调度器同时停止接收新的激活。
+        """
+        with self._loops_lock:
+            self.active_loops.clear()
+        self.scheduler.cancel_all(stopping)
+
+    def _release_keys(self, press_keys: dict):
+        """松开 press_keys 中仍处于按下状态、且没有其他激活按住的按键"""
+        release = self.key_ledger.release
+        for slot, epoch in press_keys.items():
+            if release(slot, epoch):
+                self._send_up(slot)
+        press_keys.clear()
+
+    def _send_up(self, slot):
+        is_mouse, key = slot
+        if is_mouse:
+            self.backend.mouse_up(key)
+        else:
+            self.backend.key_up(key)
+
+    def release_all_keys(self) -> int:
+        """紧急松开所有宏按住的按键，返回松开的按键数量；仍在执行的激活之后不会再松开这些键"""
+        slots = self.key_ledger.release_all()
+        for slot in slots:
+            self._send_up(slot)
+        return len(slots)
+
+    def refresh_foreground(self) -> bool:
+        """查询一次前台进程，需要时切换分发索引，返回前台进程是否变化"""
+        name = self._get_foreground_process_name()
+        changed = name != self._foreground_name
+        self._foreground_name = name
+        # 切换 profile 只需一次字典查找和一次引用替换，监听器与调度线程保持运行
+        table = self._tables.get(name, self._fallback_table)
+        if table is not self._dispatch:
+            self._switch_dispatch(table)
+        return changed
+
+    def _foreground_monitor(self):
+        """轮询前台进程并切换分发索引；最近有输入时按最短间隔轮询，空闲时间隔逐次加倍"""
+        interval = FOREGROUND_POLL_MIN
+        wake = self._foreground_wake
         try:
-            while self.is_running:
-                matches = self._is_foreground_process()
-                with self._foreground_lock:
-                    self._foreground_matches = matches
-                if prev is None:
-                    prev = matches
-                elif matches != prev:
-                    if not matches:
-                        with self._loops_lock:
-                            if self.active_loops:
-                                self.active_loops.clear()
-                        if self.open_log:
-                            print(f'前台进程不是 {self.process_name}，已临时暂停事件并清理循环')
-                    else:
-                        if self.open_log:
-                            print(f'前台进程回到 {self.process_name}，恢复事件响应')
-                    prev = matches
-                time.sleep(interval)
+            while self.is_running and self._tables:
+                changed = self.refresh_foreground()
+                if changed or self._clock() - self._last_input_time < FOREGROUND_ACTIVE_WINDOW:
+                    interval = FOREGROUND_POLL_MIN
+                else:
+                    interval = min(interval * 2, FOREGROUND_POLL_MAX)
+                self._foreground_idle = interval >= FOREGROUND_POLL_MAX
+                if wake.wait(interval):
+                    wake.clear()
+                    interval = FOREGROUND_POLL_MIN
         except Exception as e:
             if self.open_log:
-                print(f'前台监视线程出错: {e}')
-
-    def _loop_trigger_actions(self, actions: List[dict], trigger_key: str):
-        press_keys = {}
-        while self.is_running:
-            # 检查循环状态时使用短暂的锁
-            with self._loops_lock:
-                if not self.active_loops.get(trigger_key, False):
-                    break
-            self.execute_actions(actions, press_keys)
-
-        for key in press_keys.keys():
-            if key in MOUSE_BUTTON:
-                pydirectinput.mouseUp(button=key, _pause=False)
-            else:
-                pydirectinput.keyUp(key, _pause=False)
+                self.log.text(f'前台监视线程出错: {e}')
+        finally:
+            self._foreground_idle = False
+
+    def _switch_dispatch(self, table: DispatchTable):
+        """替换当前生效的分发索引；profile 变化时取消原 profile 中仍在运行的循环"""
+        previous = self._dispatch
+        self._dispatch = table
+        if table.profile == previous.profile:
+            return
+        if table.combos is not None:
+            table.combos.reset()
+        self._clear_loops()
+        if not self.open_log:
+            return
+        if table.profile is None:
+            self.log.text(f'前台进程不是 {self.process_name}，已临时暂停事件并清理循环')
+        elif table.profile:
+            self.log.text(f'前台进程切换到 {table.profile}，使用对应的 profile')
+        elif self.process_name:
+            self.log.text(f'前台进程回到 {self.process_name}，恢复事件响应')
+        else:
+            self.log.text('前台进程没有对应的 profile，使用顶层触发器')
+
+    def _build_dispatch_tables(self, triggers: Dict[str, CompiledTrigger],
+                               config: dict) -> Tuple[Dict[str, DispatchTable], DispatchTable]:
+        """按 profile 构建监听回调使用的分发索引，返回 (进程名 -> DispatchTable, 前台进程无对应项时的索引)
+
+        config 为 triggers 所属的配置，重新加载时 self.config 尚未替换。
+        顶层触发器在指定了 process 时只对该进程生效（profile 中同名进程优先），否则对所有进程生效。
+        """
+        handlers = {
+            'once': self._handle_once,
+            'hold': self._handle_hold,
+            'toggle': self._handle_toggle,
+        }
+        chords = {}
+        for trigger in triggers.values():
+            key_chords, mouse_chords, combos = chords.setdefault(trigger.profile, ({}, {}, []))
+            entry = (trigger, handlers[trigger.trigger_type])
+            device, modifiers, key = parse_trigger_key(trigger.trigger_key)
+            if device == 'combo':
+                steps = [(step_modifiers, self._input_token(step_device, step_key))
+                         for step_device, step_modifiers, step_key in trigger.sequence]
+                if all(token is not None for _, token in steps):
+                    combos.append((steps, trigger.window, entry))
+                continue
+            token = self._input_token(device, key)
+            if token is not None:
+                (key_chords if device == 'keyboard' else mouse_chords)[(modifiers, token)] = entry
+        ignore_modifiers = config.get('ignore_modifiers', False)
+        tables = {profile: DispatchTable(profile, self._expand_chords(key_chords, ignore_modifiers),
+                                         self._expand_chords(mouse_chords, True),
+                                         ComboMatcher(combos, ignore_modifiers) if combos else None)
+                  for profile, (key_chords, mouse_chords, combos) in chords.items()}
+        default_table = tables.pop('', None) or DispatchTable('', {}, {})
+        if not self.process_name:
+            return tables, default_table
+        tables.setdefault(self.process_name, default_table)
+        return tables, BLOCKED_TABLE
+
+    def _get_input_types(self) -> tuple:
+        if self._input_types is None:
+            from pynput import keyboard, mouse
+            self._input_types = (keyboard.Key, mouse.Button)
+        return self._input_types
+
+    def _input_token(self, device: str, key: str):
+        """监听回调中用于索引的键：字符键为字符本身，特殊键与鼠标按键为 pynput 对象，当前平台不支持时为 None"""
+        if device != 'mouse' and len(key) == 1:
+            return key
+        key_type, button_type = self._get_input_types()
+        return getattr(button_type if device == 'mouse' else key_type, key, None)
+
+    @staticmethod
+    def _build_modifier_keys(key_type) -> Dict[object, int]:
+        """修饰键对象 -> 位掩码"""
+        return {getattr(key_type, name): bit for name, bit in MODIFIER_KEYS if hasattr(key_type, name)}
+
+    @staticmethod
+    def _expand_chords(chords: dict, ignore_modifiers: bool) -> dict:
+        """把 (修饰键掩码, 键) -> 索引项 展开为查找表
+
+        ignore_modifiers 时不带修饰键的触发器展开到每种修饰键组合，组合键优先于不带修饰键的触发器。
+        """
+        masks = range(MODIFIER_COMBINATIONS) if ignore_modifiers else (0,)
+        index = {}
+        for (modifiers, key), entry in chords.items():
+            if not modifiers:
+                for mask in masks:
+                    index[(mask, key)] = entry
+        for (modifiers, key), entry in chords.items():
+            if modifiers:
+                index[(modifiers, key)] = entry
+        return index
 
     def handle_trigger(self, trigger_key: str, is_press: bool = True):
-        """处理触发事件"""
-        if trigger_key not in self.config:
+        """处理触发事件，profile 中的触发器名为 "<进程名>/<触发键>"，只在该 profile 生效时响应"""
+        trigger = self.triggers.get(trigger_key)
+        if trigger is None:
             return
 
-        if self._is_blocked():
+        if self._is_blocked() or trigger.profile != self._dispatch.profile:
             return
 
-        trigger_config = self.config[trigger_key]
-        trigger_type = trigger_config.get('trigger_type', 'press_once')
-        actions = trigger_config.get('actions', [])
+        if trigger.trigger_type == 'once':
+            self._handle_once(trigger, is_press)
+        elif trigger.trigger_type == 'hold':
+            self._handle_hold(trigger, is_press)
+        else:
+            self._handle_toggle(trigger, is_press)
+
+    def _trigger_metrics(self, trigger: CompiledTrigger, hook_time: Optional[float]):
+        """启用统计时记录钩子回调到处理函数的延迟，并返回该触发器的统计对象"""
+        metrics = self.metrics.for_trigger(trigger.name)
+        if hook_time is not None:
+            metrics.hook_to_handler.record(self._clock() - hook_time)
+        return metrics
+
+    def _submit_loop(self, trigger_key: str, activation: Activation):
+        """提交循环激活；调度器正在停止而拒绝时从 active_loops 中移除"""
+        if not self.scheduler.submit(activation):
+            with self._loops_lock:
+                if self.active_loops.get(trigger_key) is activation:
+                    del self.active_loops[trigger_key]
 
-        if trigger_type == 'once' and is_press:
-            thread = threading.Thread(target=self.wrap_thread_function(self._trigger_action, actions), daemon=True)
-            with self.thread_lock:
-                self.active_threads.append(thread)
+    def _handle_once(self, trigger: CompiledTrigger, is_press: bool, hook_time: Optional[float] = None):
+        if not self.is_running:
+            return
+        metrics = self._trigger_metrics(trigger, hook_time) if self.metrics else None
+        if is_press:
             if self.open_log:
-                print(f'Trigger: {trigger_key}, Type: {trigger_type}')
-            thread.start()
-        elif trigger_type == 'hold':
-            if is_press:
-                should_start = False
-                with self._loops_lock:
-                    if trigger_key not in self.active_loops:
-                        self.active_loops[trigger_key] = True
-                        should_start = True
-                
-                if should_start:
-                    thread = threading.Thread(target=self.wrap_thread_function(self._loop_trigger_actions, actions, trigger_key), daemon=True)
-                    with self.thread_lock:
-                        self.active_threads.append(thread)
-                    if self.open_log:
-                        print(f'Trigger: {trigger_key}, Type: {trigger_type}')
-                    thread.start()
-            else:
+                self.log.emit(LOG_TRIGGER, trigger.name, trigger.trigger_type)
+            self.scheduler.submit(Activation(trigger, False, metrics, self._clock()))
+
+    def _handle_hold(self, trigger: CompiledTrigger, is_press: bool, hook_time: Optional[float] = None):
+        if not self.is_running:
+            return
+        metrics = self._trigger_metrics(trigger, hook_time) if self.metrics else None
+        trigger_key = trigger.name
+        if is_press:
+            activation = None
+            with self._loops_lock:
+                if trigger_key not in self.active_loops:
+                    activation = Activation(trigger, True, metrics, self._clock())
+                    self.active_loops[trigger_key] = activation
+
+            if activation:
                 if self.open_log:
-                    print(f'Trigger Stop: {trigger_key}, Type: {trigger_type}')
-                with self._loops_lock:
-                    self.active_loops.pop(trigger_key, None)
-        elif trigger_type == 'toggle':
-            if is_press:
-                should_start = False
-                with self._loops_lock:
-                    if trigger_key not in self.active_loops:
-                        self.active_loops[trigger_key] = True
-                        should_start = True
-                    else:
-                        if self.open_log:
-                            print(f'Trigger Stop: {trigger_key}, Type: {trigger_type}')
-                        self.active_loops.pop(trigger_key)
-                
-                if should_start:
-                    thread = threading.Thread(target=self.wrap_thread_function(self._loop_trigger_actions, actions, trigger_key), daemon=True)
-                    with self.thread_lock:
-                        self.active_threads.append(thread)
+                    self.log.emit(LOG_TRIGGER, trigger_key, trigger.trigger_type)
+                self._submit_loop(trigger_key, activation)
+        else:
+            if self.open_log:
+                self.log.emit(LOG_TRIGGER_STOP, trigger_key, trigger.trigger_type)
+            with self._loops_lock:
+                activation = self.active_loops.pop(trigger_key, None)
+            if activation:
+                self.scheduler.cancel(activation)
+
+    def _handle_toggle(self, trigger: CompiledTrigger, is_press: bool, hook_time: Optional[float] = None):
+        if not self.is_running:
+            return
+        metrics = self._trigger_metrics(trigger, hook_time) if self.metrics else None
+        trigger_key = trigger.name
+        if is_press:
+            activation = None
+            with self._loops_lock:
+                if trigger_key not in self.active_loops:
+                    activation = Activation(trigger, True, metrics, self._clock())
+                    self.active_loops[trigger_key] = activation
+                else:
                     if self.open_log:
-                        print(f'Trigger: {trigger_key}, Type: {trigger_type}')
-                    thread.start()
+                        self.log.emit(LOG_TRIGGER_STOP, trigger_key, trigger.trigger_type)
+                    self.scheduler.cancel(self.active_loops.pop(trigger_key))
+
+            if activation:
+                if self.open_log:
+                    self.log.emit(LOG_TRIGGER, trigger_key, trigger.trigger_type)
+                self._submit_loop(trigger_key, activation)
+
+    def _update_modifier(self, key, bit: int, pressed: bool):
+        held = self._held_modifiers
+        if pressed:
+            held[key] = bit
+            self._modifiers |= bit
+            return
+        held.pop(key, None)
+        # 左右两侧的同一修饰键可能同时按住，按仍按下的修饰键重新计算
+        modifiers = 0
+        for held_bit in held.values():
+            modifiers |= held_bit
+        self._modifiers = modifiers
+
+    def _key_token(self, key, char: str) -> str:
+        """字符键的索引键：字母统一为小写；按住修饰键时字符可能是控制字符或上档字符（shift+1 为 !），
+        字母与数字按虚拟键码还原"""
+        if self._modifiers:
+            vk = getattr(key, 'vk', None)
+            if vk is not None and (0x30 <= vk <= 0x39 or 0x41 <= vk <= 0x5A):
+                char = chr(vk)
+            elif char < ' ':
+                char = chr(ord(char) + 96)
+        return char.lower()
+
+    def _feed_combos(self, combos: ComboMatcher, symbol: tuple, now: float, hook_time: Optional[float]):
+        """按下事件推进按键序列自动机，有序列完成时触发；与单键触发器相互独立"""
+        if self._is_blocked():
+            return
+        entry = combos.press(symbol, now)
+        if entry is not None:
+            trigger, handler = entry
+            handler(trigger, True, hook_time)
 
     def on_keyboard_press(self, key):
-        """键盘事件按下处理"""
-        # 检查修饰键
-        if key == keyboard.Key.ctrl_l or key == keyboard.Key.ctrl_r:
-            self._ctrl_pressed = True
-        if key == keyboard.Key.shift_l or key == keyboard.Key.shift_r:
-            self._shift_pressed = True
-
-        key_name = key.char if hasattr(key, 'char') else None
-        
+        """键盘事件按下处理（运行在系统钩子线程上，需尽快返回）"""
+        now = self._clock()
+        hook_time = now if self.metrics else None
+        # 任何按键（包括 alt-tab）都让前台监视线程加快轮询，尽快切换到新前台进程的 profile
+        self._last_input_time = now
+        if self._foreground_idle:
+            self._foreground_wake.set()
+        char = getattr(key, 'char', None)
+        if char is None:
+            # 没有字符的特殊键：修饰键只更新掩码，其余特殊键以 pynput 的 Key 对象作为索引键
+            bit = self._modifier_keys.get(key)
+            if bit is not None:
+                self._update_modifier(key, bit, True)
+                return
+            key_name = key
+        else:
+            key_name = self._key_token(key, char)
+        modifiers = self._modifiers
+
         # 检查暂停/恢复快捷键
-        if key_name in ('x', 'X', '\x18'):
-            if self._ctrl_pressed and self._shift_pressed:
-                if self._events_paused.is_set():
-                    self._events_paused.clear()
-                else:
-                    self._events_paused.set()
-                    with self._loops_lock:
-                        self.active_loops.clear()
-                print(f'事件响应已{"暂停" if self.events_paused else "恢复"}')
+        if modifiers & PAUSE_MODIFIERS == PAUSE_MODIFIERS and key_name == PAUSE_KEY:
+            if self._events_paused.is_set():
+                self._events_paused.clear()
+            else:
+                self._events_paused.set()
+                self._cancel_all()
+            self.log.emit(LOG_PAUSED, self.events_paused)
+            return
+
+        dispatch = self._dispatch
+        if dispatch.combos is not None:
+            self._feed_combos(dispatch.combos, (modifiers, key_name), now, hook_time)
+
+        # 未配置的按键（包括修饰键组合不匹配的组合键）在加锁、分配之前直接返回
+        entry = dispatch.key_index.get((modifiers, key_name))
+        if entry is None:
+            if not modifiers & MOD_SHIFT or char is None:
+                return
+            # shift 产生的上档字符（! ? 等）本身就是触发键，与不按 shift 的触发器相同
+            entry = dispatch.key_index.get((modifiers & ~MOD_SHIFT, char))
+            if entry is None:
                 return
 
         if self._is_blocked():
             return
 
-        if key_name:
-            should_trigger = False
-            with self._keys_lock:
-                if key_name not in self.pressed_keys:
-                    if self.open_log:
-                        print(f'keyDown {key_name}')
-                    self.pressed_keys.add(key_name)
-                    should_trigger = True
-            
-            # 在锁外触发事件
-            if should_trigger:
-                self.handle_trigger(f'keyboard_{key_name}', True)
+        if key_name in self.pressed_keys:
+            return
+        self.pressed_keys[key_name] = entry
+        if self.open_log:
+            self.log.emit(LOG_KEY_DOWN, key_name)
+        trigger, handler = entry
+        handler(trigger, True, hook_time)
 
     def on_keyboard_release(self, key):
         """键盘事件抬起处理"""
-        if key == keyboard.Key.ctrl_l or key == keyboard.Key.ctrl_r:
-            self._ctrl_pressed = False
-        if key == keyboard.Key.shift_l or key == keyboard.Key.shift_r:
-            self._shift_pressed = False
+        hook_time = self._clock() if self.metrics else None
+        char = getattr(key, 'char', None)
+        if char is None:
+            bit = self._modifier_keys.get(key)
+            if bit is not None:
+                self._update_modifier(key, bit, False)
+                return
+            key_name = key
+        else:
+            key_name = self._key_token(key, char)
+
+        combos = self._dispatch.combos
+        if combos is not None:
+            combos.release(key_name)
+        entry = self.pressed_keys.pop(key_name, None)
+        if entry is None:
+            return
 
         if self._is_blocked():
             return
 
-        key_name = key.char if hasattr(key, 'char') else None
-        if key_name:
-            with self._keys_lock:
-                if self.open_log:
-                    print(f'keyUp {key_name}')
-                self.pressed_keys.discard(key_name)
-            # 在锁外触发事件
-            self.handle_trigger(f'keyboard_{key_name}', False)
+        if self.open_log:
+            self.log.emit(LOG_KEY_UP, key_name)
+        trigger, handler = entry
+        handler(trigger, False, hook_time)
 
     def on_mouse_click(self, x, y, button, pressed):
         """鼠标点击事件处理"""
-        # 如果事件已暂停或前台进程不匹配，不处理鼠标事件
+        now = self._clock()
+        hook_time = now if self.metrics else None
+        self._last_input_time = now
+        if self._foreground_idle:
+            self._foreground_wake.set()
+        dispatch = self._dispatch
+        if pressed:
+            modifiers = self._modifiers
+            if dispatch.combos is not None:
+                self._feed_combos(dispatch.combos, (modifiers, button), now, hook_time)
+            entry = dispatch.mouse_index.get((modifiers, button))
+            if entry is None:
+                return
+            self._pressed_buttons[button] = entry
+        else:
+            if dispatch.combos is not None:
+                dispatch.combos.release(button)
+            entry = self._pressed_buttons.pop(button, None)
+            if entry is None:
+                return
+
+        # 如果事件已暂停，不处理鼠标事件
         if self._is_blocked():
             return
 
-        button_name = button.name if hasattr(button, 'name') else None
-        if button_name:
-            if self.open_log:
-                print(f'mouse_{button_name} {"down" if pressed else "up"}')
-            self.handle_trigger(f'mouse_{button_name}', pressed)
+        if self.open_log:
+            self.log.emit(LOG_MOUSE, button.name, pressed)
+        trigger, handler = entry
+        handler(trigger, pressed, hook_time)
+
+    def _set_timer_resolution(self, enable: bool):
+        """调度线程运行期间将 Windows 系统计时器精度提高到 1ms
+
+        所有延时（不只是 precise 模式）都在条件变量上等待，默认的 15.6ms 时钟周期会让 sleep 模式的短延时
+        明显变长且抖动，因此不按触发器的延时模式区分。
+        """
+        if enable == self._timer_period_set:
+            return
+        try:
+            import ctypes
+            if enable:
+                ctypes.windll.winmm.timeBeginPeriod(1)
+            else:
+                ctypes.windll.winmm.timeEndPeriod(1)
+            self._timer_period_set = enable
+        except Exception:
+            pass
+
+    def _start_foreground_monitor(self):
+        """指定了 process_name 或配置了 profiles 时启动后台监视线程，随前台进程切换分发索引"""
+        if not self._tables or not self.is_running:
+            return
+        if self.monitor_thread and self.monitor_thread.is_alive():
+            return
+        self.monitor_thread = threading.Thread(target=self._foreground_monitor, daemon=True)
+        self.monitor_thread.start()
+
+    def start_engine(self, threaded: bool = True):
+        """只启动宏调度，不安装输入钩子；供无界面的基准测试直接调用 handle_trigger
+
+        threaded 为 False 时不启动调度线程，由调用方通过 scheduler.run_due 推进（见 simulator）。
+        """
+        self._is_running.set()
+        self._stop_requested.clear()
+        self.log.start()
+        if threaded:
+            self._set_timer_resolution(True)
+            self.scheduler.start()
 
     def start(self):
         """启动监听"""
-        self._is_running.set()
+        from pynput import keyboard, mouse
+        self._modifier_keys = self._build_modifier_keys(keyboard.Key)
+        self.start_engine()
         self.keyboard_listener = keyboard.Listener(on_press=self.on_keyboard_press, on_release=self.on_keyboard_release)
         self.mouse_listener = mouse.Listener(on_click=self.on_mouse_click)
         
@@ -354,46 +868,55 @@ class AutoInputManager:
         self.mouse_listener.start()
 
         print('启动监听, 按 Ctrl+Shift+x 暂停/恢复监听')
-        # 如果用户指定了 process_name，则启动后台监视线程来缓存前台进程匹配状态
-        if self.process_name:
-            self.monitor_thread = threading.Thread(target=self._foreground_monitor, daemon=True)
-            self.monitor_thread.start()
+        self._start_foreground_monitor()
         
         try:
+            next_check = time.perf_counter() + CONFIG_WATCH_INTERVAL
             while self.is_running:
-                time.sleep(0.1)
+                if self._stop_requested.wait(0.1):
+                    break
+                if self.watch_config and time.perf_counter() >= next_check:
+                    next_check = time.perf_counter() + CONFIG_WATCH_INTERVAL
+                    self._check_config_changed()
         except KeyboardInterrupt:
             self.stop()
 
-    def stop(self):
-        """停止监听并清理所有正在运行的操作"""
+    def stop(self, timeout: float = STOP_TIMEOUT) -> List[str]:
+        """停止监听并清理所有正在运行的操作，最多等待 timeout 秒；返回超时仍未结束的触发器名
+
+        所有宏（包括 once）都会被取消，无论是否超时，宏按住的按键都会被松开。
+        """
         print("正在停止所有操作...")
+        deadline = time.perf_counter() + timeout
         self._is_running.clear()
-        
-        # 清理所有活动的循环
-        with self._loops_lock:
-            self.active_loops.clear()
-            
+        self._stop_requested.set()
+        self._foreground_wake.set()
+
+        # 取消所有宏并拒绝之后提交的激活，延时中的激活立即唤醒并松开按键
+        self._cancel_all(stopping=True)
+
         # 停止所有监听器
         if self.keyboard_listener:
             self.keyboard_listener.stop()
         if self.mouse_listener:
             self.mouse_listener.stop()
-        
-        # 确保监听器完全停止
-        if self.keyboard_listener:
-            self.keyboard_listener.join(2)
-        if self.mouse_listener:
-            self.mouse_listener.join(2)
-
-        # 等待所有操作线程结束
-        for thread in self.active_threads:
-            try:
-                thread.join()
-            except:
-                pass  # 忽略超时异常
-        
-        # 清理线程列表
-        self.active_threads.clear()
+        for listener in (self.keyboard_listener, self.mouse_listener):
+            if listener:
+                listener.join(max(deadline - time.perf_counter(), 0.0))
+
+        # 在剩余时间内等待调度器处理完取消；超时的激活不再等待，按键由状态表统一松开
+        stragglers = [activation.trigger_key
+                      for activation in self.scheduler.stop(max(deadline - time.perf_counter(), 0.0))]
+        released = self.release_all_keys()
+        if stragglers:
+            self.log.text(f'停止超时，{len(stragglers)} 个宏仍未结束: {", ".join(stragglers)}')
+        if released and (self.open_log or stragglers):
+            self.log.text(f'停止时仍有 {released} 个按键处于按下状态，已全部松开')
+        self._set_timer_resolution(False)
+        if self.metrics:
+            for line in self.metrics.report():
+                self.log.text(line)
+        self.log.stop()
             
-        print("所有操作已停止")
\ No newline at end of file
+        print("所有操作已停止")
+        return stragglers
\ No newline at end of file
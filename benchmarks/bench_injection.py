@@ -0,0 +1,166 @@
+"""注入延迟基准测试：使用 RecordingBackend 驱动真实的 AutoInputManager，无需桌面环境。
+
+测量项：
+- 触发到首个注入事件的延迟（handle_trigger 调用到后端收到第一个事件）
+- 单个动作的执行开销（一长串无延时动作的平均间隔，分别测量逐个注入与批量注入）
+- hold 循环的周期（sleep 与 precise 两种延时模式）
+- 键盘钩子回调的分发开销（未配置按键的按下/抬起，对比只有一个触发器与数百个组合键触发器）
+
+用法:
+  python benchmarks/bench_injection.py
+  python benchmarks/bench_injection.py --rounds 2000 --period 0.01
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+if sys.platform != 'win32' and not os.environ.get('DISPLAY'):
+    # 没有桌面环境时 pynput 只能使用 dummy 后端导入
+    os.environ.setdefault('PYNPUT_BACKEND', 'dummy')
+
+from auto_input_manager import AutoInputManager  # noqa: E402
+from output_backend import RecordingBackend  # noqa: E402
+
+
+def _make_manager(config: dict) -> AutoInputManager:
+    fd, path = tempfile.mkstemp(suffix='.json')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(config, f)
+    try:
+        manager = AutoInputManager(path, False, backend=RecordingBackend(), use_cache=False)
+    finally:
+        os.remove(path)
+    manager.start_engine()
+    return manager
+
+
+def _wait_events(backend: RecordingBackend, count: int, timeout: float = 5.0):
+    end = time.perf_counter() + timeout
+    while len(backend.events) < count and time.perf_counter() < end:
+        time.sleep(0.0005)
+
+
+def _report(name: str, samples: list, unit: float = 1e6, suffix: str = 'us'):
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f'{name:<28} n={len(samples):<6} '
+          f'mean={statistics.fmean(samples) * unit:9.2f}{suffix} '
+          f'p50={statistics.median(samples) * unit:9.2f}{suffix} '
+          f'p99={p99 * unit:9.2f}{suffix} '
+          f'max={samples[-1] * unit:9.2f}{suffix}')
+
+
+def bench_trigger_latency(rounds: int):
+    manager = _make_manager({
+        'keyboard_a': {'trigger_type': 'once', 'actions': [{'type': 'keyboard', 'action': 'click', 'key': 'a'}]},
+    })
+    backend = manager.backend
+    samples = []
+    try:
+        for _ in range(rounds):
+            backend.clear()
+            start = time.perf_counter()
+            manager.handle_trigger('keyboard_a', True)
+            _wait_events(backend, 1)
+            samples.append(backend.events[0][0] - start)
+    finally:
+        manager.stop()
+    _report('触发到首个注入', samples)
+
+
+def bench_action_overhead(actions: int, batch: bool):
+    manager = _make_manager({
+        'batch': batch,
+        'keyboard_a': {'trigger_type': 'once',
+                       'actions': [{'type': 'keyboard', 'action': 'click', 'key': 'a'}] * actions},
+    })
+    backend = manager.backend
+    try:
+        start = time.perf_counter()
+        manager.handle_trigger('keyboard_a', True)
+        _wait_events(backend, actions)
+    finally:
+        manager.stop()
+    if batch:
+        # 批量注入的事件共用同一时间戳，只能统计整批的平均开销
+        per_action = (backend.events[-1][0] - start) / actions
+        print(f'{"单个动作开销 (batch)":<28} n={actions:<6} mean={per_action * 1e6:9.2f}us')
+        return
+    stamps = [event[0] for event in backend.events]
+    _report('单个动作开销', [b - a for a, b in zip(stamps, stamps[1:])])
+
+
+def bench_loop_period(period: float, duration: float, delay_mode: str):
+    manager = _make_manager({
+        'delay_mode': delay_mode,
+        'keyboard_a': {'trigger_type': 'hold', 'actions': [
+            {'type': 'mouse', 'action': 'click', 'key': 'left'},
+            {'type': 'delay', 'duration': period},
+        ]},
+    })
+    backend = manager.backend
+    try:
+        manager.handle_trigger('keyboard_a', True)
+        time.sleep(duration)
+        manager.handle_trigger('keyboard_a', False)
+    finally:
+        manager.stop()
+    stamps = [event[0] for event in backend.events]
+    periods = [b - a for a, b in zip(stamps, stamps[1:])]
+    _report(f'循环周期 ({delay_mode})', periods, 1e3, 'ms')
+    expected = len(periods) * period
+    print(f'{"":<28} 累计漂移 {((stamps[-1] - stamps[0]) - expected) * 1e3:+.3f}ms / {len(periods)} 个周期')
+
+
+class _Char:
+    """模拟 pynput 的字符键对象"""
+
+    def __init__(self, char: str):
+        self.char = char
+
+
+def bench_hook_dispatch(rounds: int, chords: int):
+    click = {'trigger_type': 'once', 'actions': [{'type': 'keyboard', 'action': 'click', 'key': 'a'}]}
+    modifiers = ['ctrl', 'alt', 'shift', 'ctrl+alt', 'ctrl+shift', 'alt+shift', 'ctrl+alt+shift']
+    chars = [chr(c) for c in range(ord('a'), ord('z') + 1)] + [str(d) for d in range(10)]
+    names = [f'keyboard_{modifier}+{char}' for modifier in modifiers for char in chars][:chords]
+    for count, config in ((1, {'keyboard_a': click}), (len(names), {name: click for name in names})):
+        manager = _make_manager(config)
+        key = _Char('`')
+        samples = []
+        try:
+            for _ in range(rounds):
+                start = time.perf_counter()
+                manager.on_keyboard_press(key)
+                manager.on_keyboard_release(key)
+                samples.append(time.perf_counter() - start)
+        finally:
+            manager.stop()
+        _report(f'钩子分发 ({count} 个触发器)', samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='AutoInputManager 注入延迟基准测试')
+    parser.add_argument('--rounds', type=int, default=500, help='触发延迟测量次数')
+    parser.add_argument('--actions', type=int, default=5000, help='动作开销测量的动作数量')
+    parser.add_argument('--period', type=float, default=0.01, help='循环周期测量的延时，单位为秒')
+    parser.add_argument('--duration', type=float, default=2.0, help='每种循环模式测量的时长，单位为秒')
+    parser.add_argument('--chords', type=int, default=200, help='钩子分发测量的组合键触发器数量')
+    args = parser.parse_args()
+
+    bench_trigger_latency(args.rounds)
+    bench_action_overhead(args.actions, False)
+    bench_action_overhead(args.actions, True)
+    bench_loop_period(args.period, args.duration, 'sleep')
+    bench_loop_period(args.period, args.duration, 'precise')
+    bench_hook_dispatch(args.rounds * 20, args.chords)
+
+
+if __name__ == '__main__':
+    main()
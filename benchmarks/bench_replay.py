@@ -0,0 +1,94 @@
+"""回放吞吐量基准测试：用 simulator 的虚拟时钟回放一段合成的长时间会话，无需桌面环境与 pynput。
+
+测量项：
+- 分发吞吐量：每秒能回放的输入事件数（包括执行触发的宏）
+- 宏时序：precise 模式 hold 循环在虚拟时间中的周期偏差，超过 --tolerance 时退出码为 1，可用于 CI 回归检查
+
+用法:
+  python benchmarks/bench_replay.py
+  python benchmarks/bench_replay.py --session 600 --rate 20 --triggers 100
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from simulator import Simulator, synthetic_trace  # noqa: E402
+
+
+def _make_simulator(config: dict) -> Simulator:
+    fd, path = tempfile.mkstemp(suffix='.json')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(config, f)
+    try:
+        return Simulator(path)
+    finally:
+        os.remove(path)
+
+
+def _session_config(triggers: int) -> dict:
+    chars = [chr(c) for c in range(ord('a'), ord('z') + 1)]
+    modifiers = ['', 'ctrl+', 'alt+', 'shift+']
+    names = [f'keyboard_{modifier}{char}' for modifier in modifiers for char in chars][:triggers]
+    config = {}
+    for index, name in enumerate(names):
+        trigger_type = ('once', 'hold', 'toggle')[index % 3]
+        config[name] = {'trigger_type': trigger_type, 'actions': [
+            {'type': 'keyboard', 'action': 'click', 'key': '1'},
+            {'type': 'delay', 'duration': 0.02},
+            {'type': 'keyboard', 'action': 'click', 'key': '2'},
+            {'type': 'delay', 'duration': 0.03, 'random': 0.01},
+        ]}
+    config['mouse_x1'] = {'trigger_type': 'toggle', 'actions': [
+        {'type': 'mouse', 'action': 'click', 'key': 'left'},
+        {'type': 'delay', 'duration': 0.05},
+    ]}
+    return config
+
+
+def bench_session(session: float, rate: float, triggers: int):
+    simulator = _make_simulator(_session_config(triggers))
+    events = synthetic_trace(simulator.manager.triggers, session, rate)
+    result = simulator.replay(events)
+    simulator.close()
+    print(f'回放 {session:.0f}s 会话: 输入 {result.inputs} 个, 输出 {len(result.outputs)} 个, 调度 {result.steps} 步, '
+          f'耗时 {result.wall_time * 1000:.2f}ms, {result.events_per_second:,.0f} 事件/秒, '
+          f'加速 {result.virtual_time / result.wall_time:,.0f} 倍')
+
+
+def bench_loop_timing(period: float, duration: float) -> float:
+    """返回 precise hold 循环的最大周期偏差（秒）"""
+    simulator = _make_simulator({'keyboard_f': {'trigger_type': 'hold', 'delay_mode': 'precise', 'actions': [
+        {'type': 'keyboard', 'action': 'click', 'key': '1'},
+        {'type': 'delay', 'duration': period},
+    ]}})
+    result = simulator.replay([(0.0, 'keyboard', 'press', 'f'), (duration, 'keyboard', 'release', 'f')], tail=0.0)
+    simulator.close()
+    times = [event_time for event_time, _event, _key in result.outputs]
+    deviation = max((abs(b - a - period) for a, b in zip(times, times[1:])), default=0.0)
+    print(f'precise 循环 {period * 1000:.1f}ms: {len(times)} 次, 最大周期偏差 {deviation * 1e6:.3f}us')
+    return deviation
+
+
+def main():
+    parser = argparse.ArgumentParser(description='虚拟时钟回放吞吐量与宏时序基准测试')
+    parser.add_argument('--session', type=float, default=600.0, help='合成会话的虚拟时长，单位为秒')
+    parser.add_argument('--rate', type=float, default=10.0, help='合成会话平均每秒按键次数')
+    parser.add_argument('--triggers', type=int, default=100, help='合成会话配置的触发器数量')
+    parser.add_argument('--period', type=float, default=0.01, help='循环时序检查的延时，单位为秒')
+    parser.add_argument('--tolerance', type=float, default=1e-6, help='允许的最大周期偏差，单位为秒')
+    args = parser.parse_args()
+
+    bench_session(args.session, args.rate, args.triggers)
+    deviation = bench_loop_timing(args.period, 60.0)
+    if deviation > args.tolerance:
+        print(f'周期偏差超过 {args.tolerance * 1e6:.3f}us')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""启动耗时基准测试：在独立子进程中导入 main / mainWindow，统计导入耗时并检查重量级依赖是否被提前导入。
+
+每个入口模块重复导入若干次（每次都是全新的解释器），取导入耗时的中位数；
+另外用 -X importtime 找出自身耗时最多的模块，并报告 pynput、psutil 等只应在用到时才导入的依赖。
+
+用法:
+  python benchmarks/bench_startup.py
+  python benchmarks/bench_startup.py --rounds 20 --budget-ms 150
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TARGETS = ('main', 'mainWindow')
+# 这些依赖只应在对应子系统真正使用时导入
+DEFERRED_MODULES = ('pynput', 'pydirectinput', 'psutil', 'ctypes', 'auto_input_manager')
+
+_TIMER_CODE = '''
+import sys, time
+start = time.perf_counter()
+import {target}
+elapsed = time.perf_counter() - start
+print(elapsed)
+print(' '.join(name for name in {deferred!r} if name in sys.modules))
+'''
+
+
+def _child_env() -> dict:
+    env = dict(os.environ)
+    if sys.platform != 'win32' and not env.get('DISPLAY'):
+        env.setdefault('PYNPUT_BACKEND', 'dummy')
+    return env
+
+
+def _measure_once(target: str):
+    code = _TIMER_CODE.format(target=target, deferred=DEFERRED_MODULES)
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=_child_env(),
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else '导入失败')
+    lines = result.stdout.splitlines()
+    return float(lines[-2]), lines[-1].split()
+
+
+def _import_profile(target: str, top: int):
+    """返回 -X importtime 中自身耗时最多的若干模块 [(自身耗时us, 累计耗时us, 模块名)]"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {target}'], cwd=ROOT,
+                            env=_child_env(), capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((int(self_us), int(cumulative_us), name.strip()))
+    rows.sort(reverse=True)
+    return rows[:top]
+
+
+def bench_target(target: str, rounds: int, top: int, budget_ms: float) -> bool:
+    try:
+        samples = []
+        loaded = []
+        for _ in range(rounds):
+            elapsed, loaded = _measure_once(target)
+            samples.append(elapsed)
+    except RuntimeError as e:
+        print(f'{target:<12} 无法导入: {e}')
+        return False
+
+    median = statistics.median(samples)
+    print(f'{target:<12} n={rounds:<4} p50={median * 1e3:8.2f}ms min={min(samples) * 1e3:8.2f}ms '
+          f'max={max(samples) * 1e3:8.2f}ms')
+    for self_us, cumulative_us, name in _import_profile(target, top):
+        print(f'{"":<12} {self_us / 1e3:7.2f}ms self {cumulative_us / 1e3:8.2f}ms total  {name}')
+
+    ok = True
+    if loaded:
+        print(f'{"":<12} 启动时提前导入了: {", ".join(loaded)}')
+        ok = False
+    if budget_ms and median * 1e3 > budget_ms:
+        print(f'{"":<12} 超出启动预算 {budget_ms:.0f}ms')
+        ok = False
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description='main.py / mainWindow.py 启动导入耗时基准测试')
+    parser.add_argument('--rounds', type=int, default=10, help='每个入口的导入次数')
+    parser.add_argument('--top', type=int, default=8, help='列出自身耗时最多的模块数量')
+    parser.add_argument('--budget-ms', type=float, default=0, help='导入耗时中位数的上限，超出时退出码为 1')
+    parser.add_argument('targets', nargs='*', default=TARGETS, help='要测量的入口模块')
+    args = parser.parse_args()
+
+    ok = True
+    for target in args.targets:
+        ok = bench_target(target, args.rounds, args.top, args.budget_ms) and ok
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
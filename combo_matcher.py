@@ -0,0 +1,127 @@
+"""按键序列触发器的匹配：把所有序列预编译为一个确定有限自动机，监听回调每个按下事件只推进一步。
+
+自动机的状态是 "各序列已匹配到第几步" 的集合（与 Aho–Corasick 相同，任何时刻都可以从第一步重新开始），
+构建时对每个状态枚举可能出现的输入，转移表为 状态 -> {(修饰键掩码, 键): (下一状态, 触发的索引项)}。
+运行时每个事件只需一次字典查找，与配置的序列数量无关。
+
+带修饰键的步骤要求修饰键完全一致；不带修饰键的步骤默认只在没有按住修饰键时匹配，
+ignore_modifiers 为 True 时在按住任意修饰键时都能匹配，与单键触发器一致。
+超时不需要为每个序列设置定时器：每个状态预先计算 "距上一步超过某个间隔后还剩下哪些序列" 的退化表，
+下一个事件到来时按距上一步的间隔退化到对应状态，表长只与状态中不同 window 的个数有关。
+有序列完成时触发其中最长的一个（多个等长时取先定义的），然后回到初始状态。
+"""
+import threading
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+from config_compiler import MODIFIER_COMBINATIONS
+
+# 输入符号：(修饰键掩码, 字符 / pynput Key / pynput Button)
+Symbol = Tuple[int, object]
+
+_NO_MATCH = (0, None)
+
+
+class ComboMatcher:
+    """多个按键序列的流式匹配器，可以在键盘与鼠标两个钩子线程中同时调用"""
+
+    def __init__(self, combos: Sequence[Tuple[Sequence[Symbol], float, tuple]], ignore_modifiers: bool = False):
+        """combos 为 [(各步的 (修饰键掩码, 键), 相邻两步最大间隔, 完成时返回的索引项)]"""
+        self.combos = [(tuple(steps), window, entry) for steps, window, entry in combos]
+        self.ignore_modifiers = ignore_modifiers
+        self._transitions: List[Dict[Symbol, Tuple[int, Optional[tuple]]]] = []
+        # 状态 -> ((间隔上限, 超过该间隔后退化到的状态), ...)，按间隔从小到大排列
+        self._decay: List[Tuple[Tuple[float, int], ...]] = []
+        self._build()
+        self._lock = threading.Lock()
+        self._state = 0
+        self._last_time = 0.0
+        # 当前按住的键，过滤按住时系统产生的重复按下事件
+        self._held = set()
+
+    def _build(self):
+        combos = self.combos
+        # 键 -> [(序列下标, 步骤下标, 修饰键掩码)]，只需检查会用到该键的步骤
+        positions: Dict[object, List[Tuple[int, int, int]]] = {}
+        for index, (steps, _window, _entry) in enumerate(combos):
+            for position, (modifiers, key) in enumerate(steps):
+                positions.setdefault(key, []).append((index, position, modifiers))
+        start_keys = {steps[0][1] for steps, _window, _entry in combos}
+        states: Dict[FrozenSet[Tuple[int, int]], int] = {}
+        pending = []
+
+        def state_id(items: FrozenSet[Tuple[int, int]]) -> int:
+            if not items:
+                return 0
+            target = states.get(items)
+            if target is None:
+                target = states[items] = len(self._transitions)
+                self._transitions.append({})
+                self._decay.append(())
+                pending.append(items)
+            return target
+
+        states[frozenset()] = 0
+        self._transitions.append({})
+        self._decay.append(())
+        pending.append(frozenset())
+        while pending:
+            state = pending.pop()
+            current = states[state]
+            # 超过较小的 window 后，去掉该 window 的序列，剩下的部分仍可继续匹配
+            windows = sorted({combos[index][1] for index, _ in state})
+            self._decay[current] = tuple(
+                (window, state_id(frozenset(item for item in state if combos[item[0]][1] > window)))
+                for window in windows)
+            transitions = self._transitions[current]
+            for key in start_keys | {combos[index][0][position][1] for index, position in state}:
+                candidates = positions[key]
+                chord_masks = {modifiers for _, _, modifiers in candidates if modifiers}
+                # 不在 chord_masks 中的掩码只能匹配不带修饰键的步骤，结果相同，只计算一次
+                classes = [(mask, [mask]) for mask in chord_masks]
+                if self.ignore_modifiers:
+                    classes.append((0, [mask for mask in range(MODIFIER_COMBINATIONS) if mask not in chord_masks]))
+                else:
+                    classes.append((0, [0]))
+                for representative, masks in classes:
+                    advanced = frozenset((index, position + 1) for index, position, modifiers in candidates
+                                         if modifiers in (0, representative)
+                                         and (position == 0 or (index, position) in state))
+                    if not advanced:
+                        continue
+                    completed = [index for index, position in advanced if position == len(combos[index][0])]
+                    if completed:
+                        best = max(completed, key=lambda index: (len(combos[index][0]), -index))
+                        transition = (0, combos[best][2])
+                    else:
+                        transition = (state_id(advanced), None)
+                    for mask in masks:
+                        transitions[(mask, key)] = transition
+
+    def reset(self):
+        """回到初始状态，并清空按住的键（切换 profile 后该 profile 没有收到期间的抬起事件）"""
+        with self._lock:
+            self._state = 0
+            self._held.clear()
+
+    def press(self, symbol: Symbol, now: float) -> Optional[tuple]:
+        """输入一个按下事件，有序列完成时返回其索引项"""
+        key = symbol[1]
+        with self._lock:
+            if key in self._held:
+                return None
+            self._held.add(key)
+            state = self._state
+            if state:
+                elapsed = now - self._last_time
+                for window, fallback in self._decay[state]:
+                    if elapsed <= window:
+                        break
+                    state = fallback
+            state, entry = self._transitions[state].get(symbol, _NO_MATCH)
+            self._state = state
+            self._last_time = now
+            return entry
+
+    def release(self, key):
+        with self._lock:
+            self._held.discard(key)
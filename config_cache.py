@@ -0,0 +1,135 @@
+"""配置加载与编译结果缓存：把校验、编译后的配置保存在配置文件旁边，下次启动时直接加载。
+
+缓存以配置文件内容的 SHA-256 与编译器版本为键，并记录 include 的每个宏文件的 SHA-256，
+任何一项不一致都回退到完整解析。缓存使用 marshal 序列化，只包含基本类型，加载时不会执行任何代码。
+
+配置的 "include" 是相对配置文件目录的宏文件路径列表，每个文件只能包含 "macros"；
+加载时把它们合并到配置的 "macros" 中，配置自身定义的同名宏优先。
+"""
+import json
+import marshal
+import os
+from typing import Dict, List, Optional, Tuple
+
+try:
+    # 打包时排除了 hashlib，直接使用底层的 _sha2 模块
+    from _sha2 import sha256
+except ImportError:
+    from hashlib import sha256
+
+from config_compiler import COMPILER_VERSION, CompiledTrigger, ConfigError, compile_config
+
+CACHE_MAGIC = 'TriggerAutoInput.compiled'
+
+
+def cache_path(config_path: str) -> str:
+    directory, name = os.path.split(config_path)
+    return os.path.join(directory, f'.{name}.cache')
+
+
+def _file_digest(path: str) -> Optional[str]:
+    try:
+        with open(path, 'rb') as f:
+            return sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def _load_cache(path: str, digest: str) -> Optional[Tuple[dict, Dict[str, CompiledTrigger]]]:
+    try:
+        with open(path, 'rb') as f:
+            magic, version, cached_digest, includes, config, triggers = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if magic != CACHE_MAGIC or version != COMPILER_VERSION or cached_digest != digest:
+        return None
+    for include_path, include_digest in includes:
+        if _file_digest(include_path) != include_digest:
+            return None
+    return config, {trigger[0]: CompiledTrigger(*trigger) for trigger in triggers}
+
+
+def save_cache(config_path: str, data: bytes, config: dict, triggers: Dict[str, CompiledTrigger],
+               includes: List[Tuple[str, str]] = ()):
+    """写入缓存，失败（例如目录只读）时静默忽略"""
+    _save_cache(config_path, sha256(data).hexdigest(), config, triggers, includes)
+
+
+def _save_cache(config_path: str, digest: str, config: dict, triggers: Dict[str, CompiledTrigger],
+                includes: List[Tuple[str, str]]):
+    payload = (CACHE_MAGIC, COMPILER_VERSION, digest, list(includes), config,
+               [tuple(trigger) for trigger in triggers.values()])
+    path = cache_path(config_path)
+    temp_path = path + '.tmp'
+    try:
+        with open(temp_path, 'wb') as f:
+            marshal.dump(payload, f)
+        os.replace(temp_path, path)
+    except (OSError, ValueError):
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+
+
+def parse_config_bytes(data: bytes) -> dict:
+    return json.loads(data.decode('utf-8-sig'))
+
+
+def include_paths(config: dict, config_path: str) -> List[str]:
+    """配置 include 的宏文件的绝对路径"""
+    includes = config.get('include', []) if isinstance(config, dict) else []
+    if isinstance(includes, str):
+        includes = [includes]
+    if not isinstance(includes, list) or not all(isinstance(path, str) for path in includes):
+        raise ConfigError('include 必须是宏文件路径或路径列表')
+    directory = os.path.dirname(os.path.abspath(config_path))
+    return [os.path.normpath(os.path.join(directory, path)) for path in includes]
+
+
+def apply_includes(config: dict, config_path: str) -> List[Tuple[str, str]]:
+    """读取 include 的宏文件并合并到 config["macros"]，返回 [(路径, SHA-256)] 供缓存校验"""
+    paths = include_paths(config, config_path)
+    if not paths:
+        return []
+    merged = {}
+    sources = {}
+    includes = []
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            included = parse_config_bytes(data)
+        except (OSError, ValueError) as e:
+            raise ConfigError(f'无法读取 include 文件 {path}: {e}')
+        if not isinstance(included, dict) or set(included) - {'macros'} or not isinstance(included.get('macros', {}), dict):
+            raise ConfigError(f'include 文件 {path} 只能包含 macros 对象')
+        for name, actions in included.get('macros', {}).items():
+            if name in merged:
+                raise ConfigError(f'宏 {name!r} 在 {sources[name]} 与 {path} 中重复定义')
+            merged[name] = actions
+            sources[name] = path
+        includes.append((path, sha256(data).hexdigest()))
+    local = config.get('macros', {})
+    if isinstance(local, dict):
+        merged.update(local)
+        config['macros'] = merged
+    return includes
+
+
+def load_config_file(config_path: str, use_cache: bool = True) -> Tuple[dict, Dict[str, CompiledTrigger], bool]:
+    """读取并编译配置文件，返回 (原始配置, 编译结果, 是否来自缓存)"""
+    with open(config_path, 'rb') as f:
+        data = f.read()
+    digest = sha256(data).hexdigest() if use_cache else None
+    if use_cache:
+        cached = _load_cache(cache_path(config_path), digest)
+        if cached is not None:
+            return cached[0], cached[1], True
+
+    config = parse_config_bytes(data)
+    includes = apply_includes(config, config_path)
+    triggers = compile_config(config)
+    if use_cache:
+        _save_cache(config_path, digest, config, triggers, includes)
+    return config, triggers, False
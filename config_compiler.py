@@ -0,0 +1,518 @@
+"""配置编译器：在加载配置时把每个触发器编译为不可变的动作程序。
+
+运行时只需按操作码索引处理函数表，不再对原始 JSON 字典做查找和字符串比较。
+非法配置在加载阶段即抛出 ConfigError，而不是在宏执行中途出错。
+
+编译后的每个操作都是固定形状的元组 ``(code, arg, extra, desc)``：
+- 键盘/鼠标按下: (OP_KEY_DOWN/OP_MOUSE_DOWN, key, slot, desc)
+- 键盘/鼠标松开: (OP_KEY_UP/OP_MOUSE_UP, key, slot, desc)
+- 键盘/鼠标点击: (OP_KEY_CLICK/OP_MOUSE_CLICK, key, None, desc)
+- 鼠标移动: (OP_MOUSE_MOVE/OP_MOUSE_MOVE_REL, (x, y), None, desc)
+- 鼠标平滑移动: (OP_MOUSE_PATH, (start, paths), interval, desc)，见 mouse_path；
+  start 为绝对路径的起点，相对路径为 None；paths 为若干条预先生成的路径，执行时随机选用一条
+- 重复块开始: (OP_REPEAT, count, end_pc, desc)，count 为 0 时直接跳到 end_pc
+- 重复块结束: (OP_REPEAT_END, body_pc, None, desc)，剩余次数大于 0 时跳回 body_pc
+- 延时: (OP_DELAY, duration, random, desc)
+- 批量注入: (OP_BATCH, ((code, key, slot, kind), ...), None, desc)
+
+连续的无延时键鼠动作默认合并为一个 OP_BATCH，由输出后端一次性注入；
+kind 为 1/-1/0 分别表示按下/松开/点击。触发器设置 "batch": false 可关闭合并。
+
+repeat 动作 {"type": "repeat", "count": n, "actions": [...]} 不展开，
+编译为首尾两个跳转操作，块内动作只保存一份，可以嵌套。
+
+macro 动作 {"type": "macro", "name": "..."} 引用顶层 "macros" 中定义的公共动作序列，
+在编译时直接内联，运行时执行的仍是扁平的操作序列。每个宏在一次编译中只编译一次，
+循环引用在编译时报错。
+
+slot 为 (is_mouse, key)，用于在 press_keys 与 KeyLedger 中记录已按下的按键，
+使同名的键盘键与鼠标键（如方向键 left 与鼠标 left）不会混淆。
+
+顶层 "profiles" 把进程名映射到各自的一组触发器，只在该进程处于前台时生效。
+profile 中的触发器以 "<进程名>/<触发键>" 为名与顶层触发器放在同一张表中，
+CompiledTrigger.profile 记录所属的进程名（顶层触发器为空字符串）。
+
+触发键可以带修饰键前缀组成组合键，例如 keyboard_ctrl+alt+f5、mouse_shift+x1，见 parse_trigger_key。
+
+combo_<名称> 为按键序列触发器：{"sequence": ["down", "down", "right", "j"], "window": 0.5, ...}，
+按顺序按下 sequence 中的按键、且相邻两步间隔不超过 window 秒时触发，只支持 once 与 toggle。
+序列中的每一步为不带 keyboard_ 前缀的键盘触发键（可带修饰键）或 mouse_<button>，
+编译为 CompiledTrigger.sequence 中的 (设备, 修饰键掩码, 键名)，由 combo_matcher 在运行时匹配。
+"""
+import os
+from numbers import Real
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from output_backend import (EV_KEY_CLICK, EV_KEY_DOWN, EV_KEY_UP, EV_MOUSE_CLICK, EV_MOUSE_DOWN,
+                            EV_MOUSE_MOVE, EV_MOUSE_MOVE_REL, EV_MOUSE_UP)
+from mouse_path import DEFAULT_MOVE_INTERVAL, EASINGS, build_path
+
+# 编译结果格式的版本号，修改操作元组或 CompiledTrigger 结构时需要递增，使旧的编译缓存失效
+COMPILER_VERSION = 9
+
+MOUSE_BUTTON = frozenset(['left', 'right', 'middle', 'x1', 'x2'])
+TRIGGER_TYPES = frozenset(['once', 'hold', 'toggle'])
+DELAY_MODES = frozenset(['sleep', 'precise'])
+# 配置顶层允许出现的非触发器键
+CONFIG_OPTION_KEYS = frozenset(['process', 'delay_mode', 'spin', 'batch', 'macros', 'include', 'profiles',
+                                'ignore_modifiers'])
+# 会影响触发器编译结果的全局选项，变化时所有触发器都需要重新编译
+COMPILE_OPTION_KEYS = frozenset(['delay_mode', 'spin', 'batch', 'macros'])
+DEFAULT_DELAY = 0.1
+# precise 模式下截止时间前改为自旋等待的时长，上限用于限制自旋占用的 CPU
+DEFAULT_SPIN = 0.002
+MAX_SPIN = 0.01
+# profile 触发器名中进程名与触发键的分隔符
+PROFILE_SEPARATOR = '/'
+
+# 修饰键位掩码，组合键触发器要求按下的修饰键与之完全一致
+MOD_CTRL = 1
+MOD_SHIFT = 2
+MOD_ALT = 4
+MOD_WIN = 8
+MODIFIER_COMBINATIONS = 16
+MODIFIER_BITS = {'ctrl': MOD_CTRL, 'shift': MOD_SHIFT, 'alt': MOD_ALT, 'win': MOD_WIN, 'cmd': MOD_WIN}
+# 按键序列触发器相邻两步的默认最大间隔，单位为秒
+DEFAULT_COMBO_WINDOW = 0.5
+COMBO_TRIGGER_TYPES = frozenset(['once', 'toggle'])
+# 可以作为键盘触发键的特殊键，名称与 pynput.keyboard.Key 一致
+SPECIAL_KEYS = frozenset([
+    'space', 'enter', 'tab', 'esc', 'backspace', 'delete', 'insert', 'home', 'end', 'page_up', 'page_down',
+    'up', 'down', 'left', 'right', 'caps_lock', 'num_lock', 'scroll_lock', 'print_screen', 'pause', 'menu',
+    'media_play_pause', 'media_stop', 'media_volume_mute', 'media_volume_down', 'media_volume_up',
+    'media_previous', 'media_next',
+] + [f'f{i}' for i in range(1, 25)])
+
+# 操作码，同时作为执行器处理函数表的下标；键鼠操作码与输出后端的事件码一致
+OP_KEY_DOWN = EV_KEY_DOWN
+OP_KEY_UP = EV_KEY_UP
+OP_KEY_CLICK = EV_KEY_CLICK
+OP_MOUSE_DOWN = EV_MOUSE_DOWN
+OP_MOUSE_UP = EV_MOUSE_UP
+OP_MOUSE_CLICK = EV_MOUSE_CLICK
+OP_MOUSE_MOVE = EV_MOUSE_MOVE
+OP_MOUSE_MOVE_REL = EV_MOUSE_MOVE_REL
+OP_DELAY = 8
+OP_BATCH = 9
+OP_MOUSE_PATH = 10
+OP_REPEAT = 11
+OP_REPEAT_END = 12
+
+_INPUT_OPCODES = {
+    ('keyboard', 'press'): OP_KEY_DOWN,
+    ('keyboard', 'release'): OP_KEY_UP,
+    ('keyboard', 'click'): OP_KEY_CLICK,
+    ('mouse', 'press'): OP_MOUSE_DOWN,
+    ('mouse', 'release'): OP_MOUSE_UP,
+    ('mouse', 'click'): OP_MOUSE_CLICK,
+}
+
+
+class ConfigError(ValueError):
+    """配置文件内容非法"""
+
+
+class CompiledTrigger(NamedTuple):
+    name: str
+    trigger_type: str
+    program: Tuple[tuple, ...]
+    # True 时延时按绝对截止时间调度，补偿上一次的超时
+    precise: bool = False
+    # 截止时间前自旋等待的时长（秒）
+    spin: float = 0.0
+    # 所属 profile 的进程名，顶层触发器为空字符串
+    profile: str = ''
+    # 按键序列触发器的各步 (设备, 修饰键掩码, 键名)，普通触发器为空
+    sequence: Tuple[Tuple[str, int, str], ...] = ()
+    # 按键序列相邻两步的最大间隔（秒）
+    window: float = 0.0
+
+    @property
+    def trigger_key(self) -> str:
+        """不带 profile 前缀的触发键，例如 keyboard_f"""
+        return self.name[len(self.profile) + 1:] if self.profile else self.name
+
+
+def parse_trigger_key(trigger_key: str) -> Tuple[str, int, str]:
+    """解析触发键，返回 (设备, 修饰键掩码, 键名)
+
+    keyboard_<修饰键+...+键>：键为单个字符（字母不区分大小写）或 SPECIAL_KEYS 中的特殊键；
+    mouse_<修饰键+...+按键>：按键为 MOUSE_BUTTON 之一。修饰键为 ctrl、shift、alt、win。
+    combo_<名称>：按键序列触发器，返回 ('combo', 0, 名称)。
+    """
+    if trigger_key.startswith('combo_'):
+        if len(trigger_key) == len('combo_'):
+            raise ConfigError(f'{trigger_key}: 按键序列触发器需要名称，例如 combo_dash')
+        return 'combo', 0, trigger_key[len('combo_'):]
+    if trigger_key.startswith('keyboard_'):
+        device = 'keyboard'
+    elif trigger_key.startswith('mouse_'):
+        device = 'mouse'
+    else:
+        raise ConfigError(f'未知的配置项 {trigger_key!r}，触发键应为 keyboard_<key>、mouse_<button> 或 combo_<name>')
+    body = trigger_key[len(device) + 1:]
+    if body == '+':
+        names, key = [], '+'
+    elif body.endswith('++'):
+        # 最后一个 + 是按键本身
+        names, key = body[:-2].split('+'), '+'
+    else:
+        *names, key = body.split('+')
+    modifiers = 0
+    for name in names:
+        bit = MODIFIER_BITS.get(name.lower())
+        if bit is None:
+            raise ConfigError(f'{trigger_key}: 未知的修饰键 {name!r}，可选 ctrl、shift、alt、win')
+        modifiers |= bit
+    if len(key) > 1:
+        key = key.lower()
+    if device == 'mouse':
+        if key not in MOUSE_BUTTON:
+            raise ConfigError(f'{trigger_key}: 未知的鼠标按键 {key!r}')
+    elif len(key) == 1:
+        key = key.lower()
+        if modifiers & MOD_SHIFT and not (key.isascii() and key.isalnum()):
+            # 按住 shift 时符号键产生的是上档字符，无法区分 shift+/ 与 ?，应直接写上档字符
+            raise ConfigError(f'{trigger_key}: shift 不能与符号键组合，请直接使用按住 shift 时输入的字符（例如 keyboard_?）')
+    elif key not in SPECIAL_KEYS:
+        raise ConfigError(f'{trigger_key}: 未知的按键 {key!r}，应为单个字符或特殊键名（space、enter、f1 等）')
+    return device, modifiers, key
+
+
+def normalize_process_name(name: str) -> str:
+    """标准化进程名用于比较：小写，去掉 .exe 后缀（如果有）"""
+    if not name:
+        return name
+    base = os.path.basename(name).lower()
+    if base.endswith('.exe'):
+        base = base[:-4]
+    return base
+
+
+def _check_duration(value, field: str, where: str) -> float:
+    if isinstance(value, bool) or not isinstance(value, Real):
+        raise ConfigError(f'{where}: {field} 必须是数字，实际为 {value!r}')
+    if value < 0:
+        raise ConfigError(f'{where}: {field} 不能为负数，实际为 {value!r}')
+    return float(value)
+
+
+def _check_coordinate(value, field: str, where: str) -> int:
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ConfigError(f'{where}: {field} 必须是整数，实际为 {value!r}')
+    return value
+
+
+def _compile_move(action: dict, where: str) -> tuple:
+    x = _check_coordinate(action.get('x'), 'x', where)
+    y = _check_coordinate(action.get('y'), 'y', where)
+    relative = _check_flag(action, 'relative', False, where)
+    duration = _check_duration(action.get('duration', 0), 'duration', where)
+    if not duration:
+        if relative:
+            return (OP_MOUSE_MOVE_REL, (x, y), None, f'mouse, move by ({x}, {y})')
+        return (OP_MOUSE_MOVE, (x, y), None, f'mouse, move ({x}, {y})')
+
+    interval = _check_duration(action.get('interval', DEFAULT_MOVE_INTERVAL), 'interval', where)
+    if not interval:
+        raise ConfigError(f'{where}: interval 必须大于 0')
+    easing = action.get('easing', 'linear')
+    if easing not in EASINGS:
+        raise ConfigError(f'{where}: 未知的 easing {easing!r}，可选 {", ".join(EASINGS)}')
+    curve = action.get('curve', 0)
+    if isinstance(curve, bool) or not isinstance(curve, Real):
+        raise ConfigError(f'{where}: curve 必须是数字，实际为 {curve!r}')
+    jitter = _check_duration(action.get('jitter', 0), 'jitter', where)
+
+    if relative:
+        start = None
+        origin = (0, 0)
+        desc = f'mouse, move by ({x}, {y}) in {duration}s'
+    else:
+        origin = action.get('from')
+        if not isinstance(origin, list) or len(origin) != 2:
+            raise ConfigError(f'{where}: 带 duration 的绝对移动需要起点 from: [x, y]，或改用 relative')
+        start = origin = (_check_coordinate(origin[0], 'from', where), _check_coordinate(origin[1], 'from', where))
+        desc = f'mouse, move {origin} -> ({x}, {y}) in {duration}s'
+    paths = build_path(origin, (x, y), duration, interval, easing, float(curve), jitter, relative)
+    return (OP_MOUSE_PATH, (start, paths), interval, desc)
+
+
+def compile_action(action: dict, where: str) -> tuple:
+    """把单个动作字典编译为操作元组"""
+    if not isinstance(action, dict):
+        raise ConfigError(f'{where}: 动作必须是对象，实际为 {action!r}')
+
+    action_type = action.get('type')
+    if action_type == 'delay':
+        duration = _check_duration(action.get('duration', DEFAULT_DELAY), 'duration', where)
+        random = _check_duration(action.get('random', 0), 'random', where)
+        return (OP_DELAY, duration, random, f'delay, {duration}')
+
+    if action_type not in ('keyboard', 'mouse'):
+        raise ConfigError(f'{where}: 未知的动作类型 {action_type!r}')
+
+    name = action.get('action')
+    if action_type == 'mouse' and name == 'move':
+        return _compile_move(action, where)
+
+    code = _INPUT_OPCODES.get((action_type, name))
+    if code is None:
+        raise ConfigError(f'{where}: {action_type} 不支持的操作 {name!r}')
+
+    key = action.get('key')
+    if not isinstance(key, str) or not key:
+        raise ConfigError(f'{where}: 缺少按键 key')
+    is_mouse = action_type == 'mouse'
+    if is_mouse and key not in MOUSE_BUTTON:
+        raise ConfigError(f'{where}: 未知的鼠标按键 {key!r}')
+
+    slot = None if name == 'click' else (is_mouse, key)
+    return (code, key, slot, f'{action_type}, {name}')
+
+
+def _check_count(value, where: str) -> int:
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        raise ConfigError(f'{where}: count 必须是非负整数，实际为 {value!r}')
+    return value
+
+
+class MacroLibrary:
+    """宏定义表：按名字编译并缓存宏的操作序列，供 _compile_actions 内联"""
+
+    def __init__(self, definitions: Optional[dict] = None):
+        if definitions is None:
+            definitions = {}
+        if not isinstance(definitions, dict):
+            raise ConfigError('macros 必须是对象：宏名 -> 动作列表')
+        self.definitions = definitions
+        self._compiled: Dict[str, Tuple[tuple, ...]] = {}
+        self._resolving: list = []
+
+    def expand(self, name, where: str) -> Tuple[tuple, ...]:
+        if not isinstance(name, str):
+            raise ConfigError(f'{where}: 宏名 name 必须是字符串，实际为 {name!r}')
+        compiled = self._compiled.get(name)
+        if compiled is not None:
+            return compiled
+        if name not in self.definitions:
+            raise ConfigError(f'{where}: 未定义的宏 {name!r}')
+        if name in self._resolving:
+            chain = ' -> '.join(self._resolving[self._resolving.index(name):] + [name])
+            raise ConfigError(f'{where}: 宏循环引用 {chain}')
+        self._resolving.append(name)
+        try:
+            program = []
+            _compile_actions(self.definitions[name], f'macros.{name}', program, self)
+        finally:
+            self._resolving.pop()
+        compiled = self._compiled[name] = tuple(program)
+        return compiled
+
+    def check_all(self):
+        """编译全部宏，使未被引用的宏中的错误也能在加载时发现"""
+        for name in self.definitions:
+            self.expand(name, 'macros')
+
+
+def _compile_actions(actions, where: str, program: list, macros: Optional[MacroLibrary] = None):
+    """编译动作列表并追加到 program，repeat 块递归编译为 OP_REPEAT ... OP_REPEAT_END，宏直接内联"""
+    if not isinstance(actions, list):
+        raise ConfigError(f'{where}: actions 必须是列表')
+    for i, action in enumerate(actions):
+        item_where = f'{where}[{i}]'
+        action_type = action.get('type') if isinstance(action, dict) else None
+        if action_type == 'repeat':
+            count = _check_count(action.get('count'), item_where)
+            program.append((OP_REPEAT, count, None, f'repeat x{count}'))
+            _compile_actions(action.get('actions', []), f'{item_where}.actions', program, macros)
+            program.append((OP_REPEAT_END, None, None, 'end repeat'))
+        elif action_type == 'macro':
+            if macros is None:
+                macros = MacroLibrary()
+            program.extend(macros.expand(action.get('name'), item_where))
+        else:
+            program.append(compile_action(action, item_where))
+
+
+def link_repeats(program: Tuple[tuple, ...]) -> Tuple[tuple, ...]:
+    """在操作位置确定（合并批量注入）之后填写重复块首尾的跳转目标"""
+    result = list(program)
+    stack = []
+    for index, op in enumerate(result):
+        if op[0] == OP_REPEAT:
+            stack.append(index)
+        elif op[0] == OP_REPEAT_END:
+            begin = stack.pop()
+            code, count, _end, desc = result[begin]
+            result[begin] = (code, count, index + 1, desc)
+            result[index] = (OP_REPEAT_END, begin + 1, None, op[3])
+    return tuple(result)
+
+
+def _batch_kind(code: int) -> int:
+    if code == OP_KEY_DOWN or code == OP_MOUSE_DOWN:
+        return 1
+    if code == OP_KEY_UP or code == OP_MOUSE_UP:
+        return -1
+    return 0
+
+
+def batch_program(program: Tuple[tuple, ...]) -> Tuple[tuple, ...]:
+    """把连续的无延时键鼠操作合并为 OP_BATCH，保持原有顺序"""
+    result = []
+    run = []
+
+    def flush():
+        if len(run) == 1:
+            result.append(run[0])
+        elif run:
+            entries = tuple((code, key, slot, _batch_kind(code)) for code, key, slot, _desc in run)
+            desc = 'batch[' + '; '.join(op[3] for op in run) + ']'
+            result.append((OP_BATCH, entries, None, desc))
+        run.clear()
+
+    for op in program:
+        if op[0] < OP_DELAY:
+            run.append(op)
+        else:
+            flush()
+            result.append(op)
+    flush()
+    return tuple(result)
+
+
+def _compile_delay_options(options: dict, defaults: Tuple[bool, float], where: str) -> Tuple[bool, float]:
+    """解析 delay_mode/spin 选项，未指定时沿用 defaults"""
+    precise, spin = defaults
+    if 'delay_mode' in options:
+        mode = options['delay_mode']
+        if mode not in DELAY_MODES:
+            raise ConfigError(f'{where}: 未知的 delay_mode {mode!r}，可选 sleep 或 precise')
+        precise = mode == 'precise'
+        spin = DEFAULT_SPIN if precise else 0.0
+    if 'spin' in options:
+        spin = _check_duration(options['spin'], 'spin', where)
+        if spin > MAX_SPIN:
+            raise ConfigError(f'{where}: spin 不能超过 {MAX_SPIN} 秒')
+    return precise, spin
+
+
+def _check_flag(options: dict, field: str, default: bool, where: str) -> bool:
+    value = options.get(field, default)
+    if not isinstance(value, bool):
+        raise ConfigError(f'{where}: {field} 必须是 true 或 false')
+    return value
+
+
+def _compile_sequence(trigger_config: dict, where: str) -> Tuple[Tuple[Tuple[str, int, str], ...], float]:
+    """编译按键序列触发器的 sequence 与 window"""
+    steps = trigger_config.get('sequence')
+    if not isinstance(steps, list) or len(steps) < 2:
+        raise ConfigError(f'{where}: sequence 必须是至少包含两个按键的列表')
+    sequence = []
+    for i, step in enumerate(steps):
+        if not isinstance(step, str):
+            raise ConfigError(f'{where}.sequence[{i}]: 按键必须是字符串，实际为 {step!r}')
+        trigger_key = step if step.startswith(('keyboard_', 'mouse_')) else f'keyboard_{step}'
+        try:
+            sequence.append(parse_trigger_key(trigger_key))
+        except ConfigError as e:
+            raise ConfigError(f'{where}.sequence[{i}]: {e}')
+    window = _check_duration(trigger_config.get('window', DEFAULT_COMBO_WINDOW), 'window', where)
+    if window <= 0:
+        raise ConfigError(f'{where}: window 必须大于 0')
+    return tuple(sequence), window
+
+
+def compile_trigger(name: str, trigger_config: dict, delay_defaults: Tuple[bool, float] = (False, 0.0),
+                    batch: bool = True, macros: Optional[MacroLibrary] = None, profile: str = '') -> CompiledTrigger:
+    """编译单个触发器配置"""
+    if not isinstance(trigger_config, dict):
+        raise ConfigError(f'{name}: 触发器配置必须是对象')
+
+    trigger_type = trigger_config.get('trigger_type')
+    if trigger_type not in TRIGGER_TYPES:
+        raise ConfigError(f'{name}: 未知的 trigger_type {trigger_type!r}')
+
+    sequence, window = (), 0.0
+    if (name[len(profile) + 1:] if profile else name).startswith('combo_'):
+        if trigger_type not in COMBO_TRIGGER_TYPES:
+            raise ConfigError(f'{name}: 按键序列触发器只支持 once 或 toggle')
+        sequence, window = _compile_sequence(trigger_config, name)
+
+    program = []
+    _compile_actions(trigger_config.get('actions', []), f'{name}.actions', program, macros)
+    program = tuple(program)
+    if _check_flag(trigger_config, 'batch', batch, name):
+        program = batch_program(program)
+    program = link_repeats(program)
+    precise, spin = _compile_delay_options(trigger_config, delay_defaults, name)
+    return CompiledTrigger(name, trigger_type, program, precise, spin, profile, sequence, window)
+
+
+def compile_config(config: dict, previous_config: Optional[dict] = None,
+                   previous_triggers: Optional[Dict[str, CompiledTrigger]] = None) -> Dict[str, CompiledTrigger]:
+    """编译整个配置，返回 触发器名 -> CompiledTrigger，profile 中的触发器名为 "<进程名>/<触发键>"
+
+    传入上一次的原始配置与编译结果时进行增量编译：影响编译的全局选项未变化、
+    且触发器配置与上次相同的触发器直接复用原来的 CompiledTrigger 对象。
+    """
+    if not isinstance(config, dict):
+        raise ConfigError('配置文件顶层必须是对象')
+
+    delay_defaults = _compile_delay_options(config, (False, 0.0), '配置')
+    batch = _check_flag(config, 'batch', True, '配置')
+    _check_flag(config, 'ignore_modifiers', False, '配置')
+    macros = MacroLibrary(config.get('macros'))
+    reusable = (
+        previous_config is not None
+        and previous_triggers is not None
+        and all(previous_config.get(key) == config.get(key) for key in COMPILE_OPTION_KEYS)
+    )
+    if not reusable:
+        macros.check_all()
+        previous_config = previous_triggers = None
+    triggers = {}
+
+    def compile_group(group: dict, previous_group: Optional[dict], profile: str, skip_options: bool):
+        where = f'profiles.{profile}' if profile else '配置'
+        parsed_keys = {}
+        for key, value in group.items():
+            if skip_options and key in CONFIG_OPTION_KEYS:
+                continue
+            try:
+                parsed = parse_trigger_key(key)
+            except ConfigError as e:
+                raise ConfigError(f'{where}: {e}')
+            if parsed in parsed_keys:
+                raise ConfigError(f'{where}: 触发键 {key!r} 与 {parsed_keys[parsed]!r} 相同')
+            parsed_keys[parsed] = key
+            name = f'{profile}{PROFILE_SEPARATOR}{key}' if profile else key
+            if previous_group is not None and name in previous_triggers and previous_group.get(key) == value:
+                triggers[name] = previous_triggers[name]
+            else:
+                triggers[name] = compile_trigger(name, value, delay_defaults, batch, macros, profile)
+
+    compile_group(config, previous_config, '', True)
+    previous_groups = _profile_groups(previous_config.get('profiles', {})) if previous_config is not None else {}
+    for profile, group in _profile_groups(config.get('profiles', {})).items():
+        compile_group(group, previous_groups.get(profile), profile, False)
+    return triggers
+
+
+def _profile_groups(profiles) -> Dict[str, dict]:
+    """校验 profiles 并按标准化后的进程名返回 进程名 -> 触发器配置"""
+    if not isinstance(profiles, dict):
+        raise ConfigError('profiles 必须是对象：进程名 -> 触发器配置')
+    groups = {}
+    for process, group in profiles.items():
+        profile = normalize_process_name(process)
+        if not profile:
+            raise ConfigError('profiles: 进程名不能为空')
+        if not isinstance(group, dict):
+            raise ConfigError(f'profiles.{process}: 必须是对象：触发键 -> 触发器配置')
+        if profile in groups:
+            raise ConfigError(f'profiles: 进程名 {process!r} 与其他 profile 重复')
+        groups[profile] = group
+    return groups
@@ -0,0 +1,142 @@
+"""前台进程解析：AutoInputManager 的前台监视线程通过它获得当前前台进程的标准化名称。
+
+- WindowsForegroundProvider: 默认提供者，通过 Windows API 查询前台窗口所属的进程
+- ManualForegroundProvider: 由调用方设置前台进程，可在没有 Windows 的环境测试 profile 切换
+
+ForegroundResolver 按 pid 缓存标准化后的进程名，每次轮询只需查询前台 pid 与进程创建时间；
+创建时间与缓存不一致说明 pid 已被新进程复用，此时才重新读取进程名。
+"""
+from typing import Dict, Optional, Tuple
+
+from config_compiler import normalize_process_name
+
+# pid -> 进程名缓存的最大条目数，超过时整体清空
+FOREGROUND_CACHE_SIZE = 256
+
+
+class ForegroundProvider:
+    """前台进程提供者接口"""
+
+    def foreground_pid(self) -> Optional[int]:
+        """当前前台窗口所属的进程 id，没有前台窗口时返回 None"""
+        raise NotImplementedError
+
+    def create_time(self, pid: int) -> Optional[float]:
+        """进程的创建时间，用于识别 pid 复用；无法获取时返回 None，此时该 pid 不会被缓存"""
+        raise NotImplementedError
+
+    def process_name(self, pid: int) -> Optional[str]:
+        """进程的可执行文件名（未标准化）"""
+        raise NotImplementedError
+
+
+class WindowsForegroundProvider(ForegroundProvider):
+    # OpenProcess 查询进程创建时间所需的最小权限
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+
+    def __init__(self):
+        # ctypes.windll 只在 Windows 上存在，非 Windows 环境构造时抛出异常
+        import ctypes
+        from ctypes import wintypes
+        self._ctypes = ctypes
+        self._user32 = ctypes.windll.user32
+        self._kernel32 = ctypes.windll.kernel32
+        self._kernel32.OpenProcess.restype = wintypes.HANDLE
+        self._pid = wintypes.DWORD()
+        self._times = [wintypes.FILETIME() for _ in range(4)]
+
+    def foreground_pid(self) -> Optional[int]:
+        hwnd = self._user32.GetForegroundWindow()
+        if not hwnd:
+            return None
+        self._user32.GetWindowThreadProcessId(hwnd, self._ctypes.byref(self._pid))
+        return self._pid.value or None
+
+    def create_time(self, pid: int) -> Optional[float]:
+        handle = self._kernel32.OpenProcess(self.PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return None
+        try:
+            byref = self._ctypes.byref
+            creation, exit_time, kernel, user = self._times
+            if not self._kernel32.GetProcessTimes(handle, byref(creation), byref(exit_time), byref(kernel),
+                                                  byref(user)):
+                return None
+            return (creation.dwHighDateTime << 32) | creation.dwLowDateTime
+        finally:
+            self._kernel32.CloseHandle(handle)
+
+    def process_name(self, pid: int) -> Optional[str]:
+        # 只在缓存未命中时调用，psutil 延迟到此时导入
+        import psutil
+        return psutil.Process(pid).name()
+
+
+class ManualForegroundProvider(ForegroundProvider):
+    """由调用方通过 set_foreground 切换前台进程，记录进程名查询次数"""
+
+    def __init__(self):
+        self.processes: Dict[int, Tuple[str, float]] = {}
+        self.pid: Optional[int] = None
+        self.name_lookups = 0
+        self._next_pid = 1000
+
+    def set_foreground(self, name: Optional[str], pid: Optional[int] = None, create_time: float = 0.0) -> Optional[int]:
+        """把前台切换到进程 name，未指定 pid 时分配新的 pid；name 为 None 表示没有前台窗口"""
+        if name is None:
+            self.pid = None
+            return None
+        if pid is None:
+            self._next_pid += 4
+            pid = self._next_pid
+        self.processes[pid] = (name, create_time)
+        self.pid = pid
+        return pid
+
+    def foreground_pid(self) -> Optional[int]:
+        return self.pid
+
+    def create_time(self, pid: int) -> Optional[float]:
+        process = self.processes.get(pid)
+        return process[1] if process else None
+
+    def process_name(self, pid: int) -> Optional[str]:
+        self.name_lookups += 1
+        process = self.processes.get(pid)
+        return process[0] if process else None
+
+
+class ForegroundResolver:
+    """把前台 pid 解析为标准化进程名，缓存 pid -> (创建时间, 进程名)"""
+
+    def __init__(self, provider: ForegroundProvider, cache_size: int = FOREGROUND_CACHE_SIZE):
+        self.provider = provider
+        self.cache_size = cache_size
+        self._cache: Dict[int, Tuple[float, str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self) -> Optional[str]:
+        """当前前台进程的标准化名称，无法获取时返回 None"""
+        provider = self.provider
+        try:
+            pid = provider.foreground_pid()
+            if not pid:
+                return None
+            created = provider.create_time(pid)
+            cached = self._cache.get(pid)
+            if cached is not None and created is not None and cached[0] == created:
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+            raw_name = provider.process_name(pid)
+        except Exception:
+            return None
+        if not raw_name:
+            return None
+        name = normalize_process_name(raw_name)
+        if created is not None:
+            if len(self._cache) >= self.cache_size:
+                self._cache.clear()
+            self._cache[pid] = (created, name)
+        return name
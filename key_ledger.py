@@ -0,0 +1,54 @@
+"""全局按键状态表：所有并发执行的宏共用，按引用计数记录每个按键被多少个激活按住。
+
+两个宏同时按住同一个键时只在 0→1 时发送按下、1→0 时发送松开，
+先结束的宏不会把另一个宏仍在按住的键松开，重复的按下也不会再次注入。
+
+release_all() 一次遍历当前按住的键（与按住的键数量成正比）即可全部松开；
+它同时递增 epoch，各激活中记录的旧 epoch 持有项随之失效，之后结束时不会重复松开
+或误减新持有者的计数。
+"""
+import threading
+from typing import Dict, List, Tuple
+
+# (is_mouse, key)，与编译后动作中的 slot 相同
+Slot = Tuple[bool, str]
+
+
+class KeyLedger:
+    """按键引用计数表，可在调度线程、钩子线程与停止流程中同时调用"""
+
+    def __init__(self):
+        self._counts: Dict[Slot, int] = {}
+        self._lock = threading.Lock()
+        self.epoch = 0
+
+    def press(self, slot: Slot) -> Tuple[bool, int]:
+        """增加一个持有者，返回 (是否需要发送按下, 持有项的 epoch)"""
+        with self._lock:
+            count = self._counts.get(slot, 0)
+            self._counts[slot] = count + 1
+            return count == 0, self.epoch
+
+    def release(self, slot: Slot, epoch: int) -> bool:
+        """减少一个持有者，返回是否需要发送松开；epoch 已过期的持有项在 release_all 时已经松开"""
+        with self._lock:
+            if epoch != self.epoch:
+                return False
+            count = self._counts.get(slot, 0)
+            if count > 1:
+                self._counts[slot] = count - 1
+                return False
+            self._counts.pop(slot, None)
+            return count == 1
+
+    def is_held(self, slot: Slot) -> bool:
+        with self._lock:
+            return slot in self._counts
+
+    def release_all(self) -> List[Slot]:
+        """清空状态表并返回所有需要松开的键，已有的持有项全部失效"""
+        with self._lock:
+            slots = list(self._counts)
+            self._counts.clear()
+            self.epoch += 1
+            return slots
@@ -0,0 +1,141 @@
+"""异步日志管线：热路径只把 (时间戳, 事件码, 参数) 放入有界环形队列，
+由后台线程统一格式化并写入控制台、文件或 GUI。
+
+这样开启 --log 诊断时，钩子线程和宏调度线程不再因为同步 print 而改变宏本身的时序。
+"""
+import collections
+import threading
+import time
+from typing import Callable, List, Optional
+
+# 事件码
+LOG_TEXT = 0            # (text,)
+LOG_ACTION = 1          # (desc,)
+LOG_DELAY = 2           # (requested, start, now, deadline)
+LOG_ALREADY_PRESSED = 3  # (key,)
+LOG_TRIGGER = 4         # (trigger_key, trigger_type)
+LOG_TRIGGER_STOP = 5    # (trigger_key, trigger_type)
+LOG_KEY_DOWN = 6        # (key_name,)
+LOG_KEY_UP = 7          # (key_name,)
+LOG_MOUSE = 8           # (button_name, pressed)
+LOG_ERROR = 9           # (error,)
+LOG_PAUSED = 10         # (paused,)
+
+_FORMATTERS = (
+    lambda text: text,
+    lambda desc: f'执行动作: {desc}',
+    lambda requested, start, now, deadline: (f'延时: 请求 {requested * 1000:.3f}ms, '
+                                             f'实际 {(now - start) * 1000:.3f}ms, '
+                                             f'偏差 {(now - deadline) * 1000:+.3f}ms'),
+    lambda key: f'按键已按下，未重复触发: {key}',
+    lambda trigger_key, trigger_type: f'Trigger: {trigger_key}, Type: {trigger_type}',
+    lambda trigger_key, trigger_type: f'Trigger Stop: {trigger_key}, Type: {trigger_type}',
+    lambda key_name: f'keyDown {key_name}',
+    lambda key_name: f'keyUp {key_name}',
+    lambda button_name, pressed: f'mouse_{button_name} {"down" if pressed else "up"}',
+    lambda error: f'宏执行出错: {error}',
+    lambda paused: f'事件响应已{"暂停" if paused else "恢复"}',
+)
+
+
+def console_sink(text: str):
+    print(text)
+
+
+class FileSink:
+    """把日志追加写入文件"""
+
+    def __init__(self, path: str):
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def __call__(self, text: str):
+        self._file.write(text + '\n')
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class LogPipeline:
+    """有界日志环形队列与后台格式化线程。
+
+    emit 只做一次 deque.append（在 CPython 中是线程安全的原子操作），
+    队列满时丢弃最旧的记录并计数，后台线程每隔 interval 秒批量取出、
+    格式化后以多行文本一次性交给各个 sink。
+    """
+
+    def __init__(self, sinks: Optional[List[Callable[[str], None]]] = None, capacity: int = 8192,
+                 interval: float = 0.05):
+        self.sinks = sinks if sinks is not None else [console_sink]
+        self.capacity = capacity
+        self.interval = interval
+        self._ring = collections.deque(maxlen=capacity)
+        self._dropped = 0
+        self._stop = threading.Event()
+        self._thread = None
+        # perf_counter 与墙上时间的对应关系，用于把时间戳格式化为时刻
+        self._wall_offset = time.time() - time.perf_counter()
+
+    def emit(self, code: int, *args):
+        ring = self._ring
+        if len(ring) == self.capacity:
+            self._dropped += 1
+        ring.append((time.perf_counter(), code, args))
+
+    def text(self, text: str):
+        self.emit(LOG_TEXT, text)
+
+    def start(self):
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='LogPipeline', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台线程并写出队列中剩余的日志"""
+        if self._thread:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        for sink in self.sinks:
+            close = getattr(sink, 'close', None)
+            if close:
+                try:
+                    close()
+                except Exception:
+                    pass
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def flush(self):
+        ring = self._ring
+        if not ring:
+            return
+        lines = []
+        dropped = self._dropped
+        if dropped:
+            self._dropped = 0
+            lines.append(f'... 日志过多，已丢弃 {dropped} 条')
+        wall_offset = self._wall_offset
+        while ring:
+            try:
+                stamp, code, args = ring.popleft()
+            except IndexError:
+                break
+            try:
+                message = _FORMATTERS[code](*args)
+            except Exception as e:
+                message = f'日志格式化失败: {code} {args!r} {e}'
+            wall = stamp + wall_offset
+            lines.append(f'[{time.strftime("%H:%M:%S", time.localtime(wall))}.{int(wall % 1 * 1000):03d}] {message}')
+
+        text = '\n'.join(lines)
+        for sink in self.sinks:
+            try:
+                sink(text)
+            except Exception:
+                pass
@@ -0,0 +1,230 @@
+"""宏调度器：用单个工作线程和截止时间堆驱动所有正在执行的宏。
+
+每次触发激活对应一个 Activation 游标，延时动作只是堆中的一个条目，
+不再为每次触发创建线程、也不会让线程阻塞在 time.sleep 上。
+
+模拟回放时不启动工作线程，由调用方通过 run_due 按虚拟时钟推进。
+"""
+import heapq
+import itertools
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+
+class Activation:
+    """一次触发激活：可恢复执行的动作程序游标"""
+    __slots__ = ('trigger_key', 'program', 'loop', 'precise', 'spin', 'pc', 'press_keys', 'cancelled',
+                 'deadline', 'delay_start', 'delay_requested', 'seq', 'metrics', 'started', 'first_pending',
+                 'loop_start', 'path', 'path_index', 'repeat_counters')
+
+    def __init__(self, trigger, loop: bool, metrics=None, now: Optional[float] = None):
+        self.trigger_key = trigger.name
+        self.program = trigger.program
+        self.loop = loop
+        self.precise = trigger.precise
+        self.spin = trigger.spin
+        self.pc = 0
+        # 本激活按住的 slot -> KeyLedger 中该持有项的 epoch
+        self.press_keys = {}
+        self.cancelled = False
+        # 本次恢复执行所对应的计划截止时间，precise 模式以它为基准推算下一次延时
+        self.deadline = time.perf_counter() if now is None else now
+        # 最近一次延时的开始时间与请求时长，用于日志中对比实际耗时
+        self.delay_start = 0.0
+        self.delay_requested = None
+        # 当前有效堆条目的序号，-1 表示不在堆中（正在执行或已结束）
+        self.seq = -1
+        # 启用统计时为该触发器的 TriggerMetrics
+        self.metrics = metrics
+        self.started = self.deadline
+        self.first_pending = True
+        self.loop_start = self.deadline
+        # 正在执行的平滑移动路径及下一个要发送的点
+        self.path = None
+        self.path_index = 0
+        # 嵌套重复块的剩余次数栈
+        self.repeat_counters = []
+
+
+class MacroScheduler:
+    """按截止时间推进 Activation 的调度器。
+
+    step(activation, now) 执行游标直到遇到延时或结束，返回下一次应当恢复的
+    perf_counter 截止时间；返回 None 表示该激活已结束。
+
+    等待堆顶截止时间时先用条件变量粗略休眠，距截止时间不足 activation.spin
+    时改为让出 CPU 的自旋等待，以获得亚毫秒级的唤醒精度。
+
+    cancel() 会把处于延时中的激活立即重新排到堆顶，由 step 检查取消标记后结束，
+    堆中被取代的旧条目通过序号比对直接丢弃。
+
+    clock 为截止时间使用的时钟，默认 perf_counter。
+    """
+
+    def __init__(self, step: Callable[[Activation, float], Optional[float]],
+                 on_error: Callable[[Activation, Exception], None],
+                 clock: Callable[[], float] = time.perf_counter):
+        self._step = step
+        self._on_error = on_error
+        self._clock = clock
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition(threading.Lock())
+        self._stopping = False
+        self._thread = None
+        # 正在执行 step 的激活，供 cancel_all 与停止超时时的报告使用
+        self._running: Optional[Activation] = None
+
+    def start(self):
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='MacroScheduler', daemon=True)
+        self._thread.start()
+
+    def submit(self, activation: Activation, deadline: Optional[float] = None) -> bool:
+        """加入一个激活，默认立即执行；正在停止时不再接收，把激活标记为已取消并返回 False"""
+        if deadline is None:
+            deadline = activation.deadline
+        with self._cond:
+            if self._stopping:
+                activation.cancelled = True
+                return False
+            self._push(deadline, activation)
+            self._cond.notify()
+        return True
+
+    def cancel(self, activation: Activation):
+        """取消激活：若它正在延时则立即唤醒，否则由执行中的 step 在下一个动作前结束"""
+        activation.cancelled = True
+        with self._cond:
+            if activation.seq >= 0:
+                self._push(self._clock(), activation)
+                self._cond.notify()
+
+    def cancel_all(self, stopping: bool = False) -> int:
+        """取消所有激活（包括 once 宏），延时中的激活立即重新排到堆顶，返回取消的数量
+
+        stopping 为 True 时在同一次加锁中停止接收新的激活，之后 submit 的激活不会再执行。
+        """
+        with self._cond:
+            if stopping:
+                self._stopping = True
+            now = self._clock()
+            activations = [activation for _, seq, activation in self._heap if seq == activation.seq]
+            for activation in activations:
+                activation.cancelled = True
+                self._push(now, activation)
+            running = self._running
+            if running is not None and not running.cancelled:
+                running.cancelled = True
+                activations.append(running)
+            self._cond.notify()
+        return len(activations)
+
+    def _push(self, deadline: float, activation: Activation):
+        seq = next(self._seq)
+        activation.seq = seq
+        heapq.heappush(self._heap, (deadline, seq, activation))
+
+    def run_due(self, until: float, advance: Callable[[float], float], max_steps: int = 1000000) -> Tuple[int, bool]:
+        """不启动工作线程时按截止时间顺序执行所有截止时间不晚于 until 的激活。
+
+        执行每个激活前调用 advance(截止时间) 把虚拟时钟拨到该时刻并返回当前时间。
+        返回 (执行的步数, 是否因超过 max_steps 而提前结束)；没有延时的循环会一直停留在同一时刻，
+        由 max_steps 防止无限执行。
+        """
+        heap = self._heap
+        steps = 0
+        while True:
+            with self._cond:
+                if not heap:
+                    return steps, False
+                deadline, seq, head = heap[0]
+                if seq != head.seq:
+                    heapq.heappop(heap)
+                    continue
+                if deadline > until:
+                    return steps, False
+                if steps >= max_steps:
+                    return steps, True
+                heapq.heappop(heap)
+                head.seq = -1
+            steps += 1
+            self._execute(head, advance(deadline))
+
+    def stop(self, timeout: Optional[float] = None) -> List[Activation]:
+        """停止接收新的调度，等待堆中已有的激活执行完毕后退出工作线程
+
+        timeout 为等待的最长时间，超时时返回仍未结束的激活（工作线程继续在后台收尾）。
+        """
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        thread = self._thread
+        if thread is None:
+            return []
+        thread.join(timeout)
+        if thread.is_alive():
+            return self.unfinished()
+        self._thread = None
+        return []
+
+    def unfinished(self) -> List[Activation]:
+        """堆中等待执行与正在执行的激活"""
+        with self._cond:
+            activations = [activation for _, seq, activation in self._heap if seq == activation.seq]
+        running = self._running
+        if running is not None and running not in activations:
+            activations.append(running)
+        return activations
+
+    def _run(self):
+        heap = self._heap
+        cond = self._cond
+        while True:
+            activation = None
+            with cond:
+                if not heap:
+                    if self._stopping:
+                        return
+                    cond.wait()
+                    continue
+                now = self._clock()
+                deadline, seq, head = heap[0]
+                if seq != head.seq:
+                    # 已被 cancel 取代的旧条目
+                    heapq.heappop(heap)
+                    continue
+                wait = deadline - now
+                if wait <= 0:
+                    heapq.heappop(heap)
+                    head.seq = -1
+                    activation = head
+                elif wait > head.spin:
+                    cond.wait(wait - head.spin)
+                    continue
+
+            if activation is None:
+                # 自旋尾段：释放锁并让出时间片，直到截止时间到达
+                time.sleep(0)
+                continue
+
+            self._execute(activation, now)
+
+    def _execute(self, activation: Activation, now: float):
+        self._running = activation
+        try:
+            deadline = self._step(activation, now)
+        except Exception as e:
+            self._running = None
+            try:
+                self._on_error(activation, e)
+            except Exception:
+                pass
+            return
+        with self._cond:
+            # 与重新入堆在同一次加锁中清除，cancel_all 不会漏掉刚执行完的激活
+            self._running = None
+            if deadline is not None:
+                # 执行期间被取消时不再等待延时，立即回到 step 中结束
+                self._push(now if activation.cancelled else deadline, activation)
@@ -1,12 +1,19 @@
 import argparse
-from auto_input_manager import AutoInputManager
+import sys
+import time
+from config_cache import load_config_file
+from config_compiler import ConfigError
+from log_pipeline import FileSink, console_sink
 
 def parse_args():
     parser = argparse.ArgumentParser(description='自动输入工具 - 通过配置文件实现键鼠事件的自动化操作',formatter_class=argparse.RawDescriptionHelpFormatter,epilog='''
 示例:
   python main.py config/example.json  # 使用示例配置文件启动
   python main.py config/example.json --log  # 启用详细日志输出
+  python main.py config/example.json --log --log-file run.log  # 详细日志同时写入文件
   python main.py config/example.json -p example  # 仅在指定进程在前台时响应事件
+  python main.py config/example.json --stats  # 统计各触发器的延迟，退出时输出 p50/p99/max
+  python main.py config/example.json --check  # 仅校验并编译配置，不启动监听
   
 快捷键:
   Ctrl+Shift+X  # 暂停/恢复事件响应和自动操作
@@ -16,13 +23,57 @@ def parse_args():
     
     parser.add_argument('config', type=str, help='配置文件，必须是有效的 JSON 文件')
     parser.add_argument('--log', action='store_true', help='启用详细日志输出')
+    parser.add_argument('--log-file', type=str, default=None, help='运行日志同时追加写入该文件')
+    parser.add_argument('--no-watch', action='store_true', help='不监视配置文件的修改（默认修改后自动重新加载）')
+    parser.add_argument('--stats', action='store_true', help='统计各触发器的延迟与抖动，停止时输出')
+    parser.add_argument('--check', action='store_true', help='仅校验并编译配置文件，输出编译结果后退出')
+    parser.add_argument('--no-cache', action='store_true', help='不读取也不写入编译结果缓存')
     parser.add_argument('-p', '--process', type=str, default=None, help='指定前台进程名，仅当该进程在前台时才响应事件')
     
     return parser.parse_args()
 
+def check_config(config_path: str, use_cache: bool) -> int:
+    """校验并编译配置，不创建监听器，返回进程退出码"""
+    try:
+        start = time.perf_counter()
+        _config, triggers, from_cache = load_config_file(config_path, use_cache)
+        elapsed = time.perf_counter() - start
+    except ConfigError as e:
+        print(f'配置文件无效: {e}')
+        return 1
+    except Exception as e:
+        print(f'加载配置文件失败: {e}')
+        return 1
+
+    op_count = sum(len(trigger.program) for trigger in triggers.values())
+    profiles = {trigger.profile for trigger in triggers.values() if trigger.profile}
+    print(f'配置有效: {len(triggers)} 个触发器, {len(profiles)} 个 profile, {op_count} 条指令')
+    print(f'加载耗时 {elapsed * 1000:.3f}ms ({"命中缓存" if from_cache else "完整编译"})')
+    if from_cache:
+        start = time.perf_counter()
+        load_config_file(config_path, use_cache=False)
+        print(f'完整编译耗时 {(time.perf_counter() - start) * 1000:.3f}ms')
+    return 0
+
 def main():
     args = parse_args()
-    manager = AutoInputManager(args.config, args.log, process_name=args.process)
+    if args.check:
+        sys.exit(check_config(args.config, not args.no_cache))
+    # 监听相关依赖较重，--check 不需要，放到这里再导入
+    from auto_input_manager import AutoInputManager
+    log_sinks = [console_sink]
+    if args.log_file:
+        log_sinks.append(FileSink(args.log_file))
+    try:
+        manager = AutoInputManager(args.config, args.log, process_name=args.process, log_sinks=log_sinks,
+                                   collect_metrics=args.stats, watch_config=not args.no_watch,
+                                   use_cache=not args.no_cache)
+    except ConfigError as e:
+        print(f'配置文件无效: {e}')
+        sys.exit(1)
+    except Exception as e:
+        print(f'加载配置文件失败: {e}')
+        sys.exit(1)
     manager.start()
 
 if __name__ == "__main__":
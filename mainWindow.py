@@ -1,23 +1,32 @@
 import builtins
+import collections
 import json
 import os
 import queue
 import threading
 import sys
-import ctypes
 import time
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 from tkinter.scrolledtext import ScrolledText
+from typing import TYPE_CHECKING
 
-import psutil
-from pynput import keyboard, mouse
+from record_journal import (ACTION_MOVE, ACTION_PRESS, ACTION_RELEASE, DEVICE_KEYBOARD, DEVICE_MOUSE,
+                            MOVE_SAMPLE_INTERVAL, RecordJournal, journal_path, journal_to_config)
 
-from auto_input_manager import AutoInputManager
+if TYPE_CHECKING:
+    # 运行时在启动监听时才导入，缩短窗口出现前的启动时间
+    from auto_input_manager import AutoInputManager
+    from pynput import keyboard, mouse
 
 
 RECORD_OUTPUT_PATH = os.path.join("config", "recorded.json")
 CLICK_MERGE_THRESHOLD_SECONDS = 0.1
+LOG_POLL_INTERVAL_MS = 100
+# 日志窗口最多保留的行数，超出后从头部裁剪
+LOG_MAX_LINES = 5000
+# 单次轮询最多显示的日志行数，积压超过该值时只保留最新的部分并提示省略了多少行
+LOG_MAX_LINES_PER_POLL = 500
 
 
 def get_app_root() -> str:
@@ -66,37 +75,55 @@ class InputRecorder:
         self.status_callback = status_callback
         self.finish_callback = finish_callback
         self.output_path = output_path
+        self.journal_path = journal_path(output_path)
         self.keyboard_listener: keyboard.Listener | None = None
         self.mouse_listener: mouse.Listener | None = None
         self.recording = False
         self.awaiting_trigger = False
         self.trigger_key: str | None = None
-        self._pending_trigger: tuple[str, str] | None = None
-        self._pending_actions: dict[tuple[str, str], tuple[dict, float]] = {}
-        self._events: list[dict] = []
-        self._last_action_time: float | None = None
+        self._pending_trigger: tuple[int, str] | None = None
+        # 当前处于按下状态的 (设备, 键名)，用于忽略按住时的自动重复
+        self._pressed: set[tuple[int, str]] = set()
+        # 事件直接追加写入录制日志，不在内存中保留
+        self._journal: RecordJournal | None = None
+        # 保护 _journal、_pending_move 与 _last_move_time：两个监听线程都会写入，
+        # stop() 在界面线程中先在锁内摘下日志再关闭，之后到达的回调不会写入已关闭的文件
+        self._journal_lock = threading.Lock()
+        # 鼠标移动按 MOVE_SAMPLE_INTERVAL 采样，间隔内只保留最新位置
+        self.record_moves = False
+        self._last_move_time = 0.0
+        self._pending_move: tuple[float, int, int] | None = None
         self._ctrl_pressed = False
         self._shift_pressed = False
+        self._ctrl_keys: tuple = ()
+        self._shift_keys: tuple = ()
 
-    def start(self) -> bool:
+    def start(self, record_moves: bool = False) -> bool:
         if self.recording:
             return False
 
         self.recording = True
+        self.record_moves = record_moves
+        self._last_move_time = 0.0
+        self._pending_move = None
         self.awaiting_trigger = True
         self.trigger_key = None
         self._pending_trigger = None
-        self._pending_actions = {}
-        self._events = []
-        self._last_action_time = None
+        self._pressed = set()
         self._ctrl_pressed = False
         self._shift_pressed = False
 
+        from pynput import keyboard, mouse
+        self._ctrl_keys = (keyboard.Key.ctrl_l, keyboard.Key.ctrl_r)
+        self._shift_keys = (keyboard.Key.shift_l, keyboard.Key.shift_r)
         self.keyboard_listener = keyboard.Listener(
             on_press=self._on_keyboard_press,
             on_release=self._on_keyboard_release,
         )
-        self.mouse_listener = mouse.Listener(on_click=self._on_mouse_click)
+        self.mouse_listener = mouse.Listener(
+            on_click=self._on_mouse_click,
+            on_move=self._on_mouse_move if record_moves else None,
+        )
         self.keyboard_listener.start()
         self.mouse_listener.start()
 
@@ -111,27 +138,30 @@ class InputRecorder:
         self.recording = False
         self.awaiting_trigger = False
         self._stop_listeners()
+        with self._journal_lock:
+            self._flush_pending_move()
+            journal = self._journal
+            self._journal = None
+        if journal:
+            journal.close()
 
         if not self.trigger_key:
             self._set_status("录制已取消")
             self._log("录制结束，但未捕获到触发键")
             return None
 
-        if self._pending_actions:
-            self._log(f"录制结束时仍有未闭合按键，已忽略 {len(self._pending_actions)} 个未闭合事件")
-            ignored_events = {id(event_info[0]) for event_info in self._pending_actions.values()}
-            self._events = [event for event in self._events if id(event) not in ignored_events]
-            self._pending_actions = {}
-
-        actions = self._build_actions()
-        payload = {
-            self.trigger_key: {
-                "trigger_type": "once",
-                "actions": actions,
-            }
-        }
+        payload, ignored = journal_to_config(self.journal_path, CLICK_MERGE_THRESHOLD_SECONDS)
+        if ignored:
+            self._log(f"录制结束时仍有未闭合按键，已忽略 {ignored} 个未闭合事件")
         return payload
 
+    def discard_journal(self):
+        """录制结果已保存后删除录制日志"""
+        try:
+            os.remove(self.journal_path)
+        except OSError:
+            pass
+
     def _stop_listeners(self):
         if self.keyboard_listener:
             self.keyboard_listener.stop()
@@ -155,26 +185,32 @@ class InputRecorder:
     def _event_time(self) -> float:
         return time.perf_counter()
 
-    def _append_delay_before(self, event_time: float):
-        if self._last_action_time is None:
-            self._last_action_time = event_time
-            return
-        delay = event_time - self._last_action_time
-        if delay > 0:
-            self._events.append({"kind": "delay", "duration": delay})
-        self._last_action_time = event_time
-
-    def _record_action(self, event: dict, event_time: float):
-        self._append_delay_before(event_time)
-        self._events.append(event)
+    def _record_action(self, device: int, action: int, key: str):
+        with self._journal_lock:
+            journal = self._journal
+            if journal:
+                # 先写入被合并掉的最后一个移动位置，保证点击发生在正确的坐标
+                self._flush_pending_move()
+                journal.append(self._event_time(), device, action, key)
+
+    def _flush_pending_move(self):
+        """写入被采样合并掉的最后一个移动位置，调用方需持有 _journal_lock"""
+        pending = self._pending_move
+        journal = self._journal
+        if pending and journal:
+            self._pending_move = None
+            event_time, x, y = pending
+            journal.append(event_time, DEVICE_MOUSE, ACTION_MOVE, (x, y))
 
     def _capture_trigger(self, trigger_key: str):
         self.trigger_key = trigger_key
         self.awaiting_trigger = False
         self._pending_trigger = None
-        self._pending_actions = {}
-        self._events = []
-        self._last_action_time = None
+        self._pressed = set()
+        os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+        journal = RecordJournal(self.journal_path, trigger_key)
+        with self._journal_lock:
+            self._journal = journal
         self._set_status("正在录制动作...")
         self._log(f"触发键已确认：{trigger_key}")
         self._log("开始录制动作，按 Ctrl+Shift+C 结束")
@@ -182,10 +218,10 @@ class InputRecorder:
     def _on_keyboard_press(self, key):
         normalized = self._normalize_keyboard_key(key)
 
-        if key in (keyboard.Key.ctrl_l, keyboard.Key.ctrl_r):
+        if key in self._ctrl_keys:
             self._ctrl_pressed = True
             return
-        if key in (keyboard.Key.shift_l, keyboard.Key.shift_r):
+        if key in self._shift_keys:
             self._shift_pressed = True
             return
         if normalized in ("c", "\x03"):
@@ -198,26 +234,24 @@ class InputRecorder:
 
         if self.awaiting_trigger:
             if normalized:
-                self._pending_trigger = ("keyboard", normalized)
+                self._pending_trigger = (DEVICE_KEYBOARD, normalized)
             return
 
         if not normalized:
             return
 
-        event_time = self._event_time()
-        pending_key = ("keyboard", normalized)
-        if pending_key not in self._pending_actions:
-            event = {"kind": "event", "time": event_time, "type": "keyboard", "action": "press", "key": normalized}
-            self._pending_actions[pending_key] = (event, event_time)
-            self._record_action(event, event_time)
+        pressed_key = (DEVICE_KEYBOARD, normalized)
+        if pressed_key not in self._pressed:
+            self._pressed.add(pressed_key)
+            self._record_action(DEVICE_KEYBOARD, ACTION_PRESS, normalized)
 
     def _on_keyboard_release(self, key):
         normalized = self._normalize_keyboard_key(key)
 
-        if key in (keyboard.Key.ctrl_l, keyboard.Key.ctrl_r):
+        if key in self._ctrl_keys:
             self._ctrl_pressed = False
             return
-        if key in (keyboard.Key.shift_l, keyboard.Key.shift_r):
+        if key in self._shift_keys:
             self._shift_pressed = False
             return
 
@@ -225,17 +259,30 @@ class InputRecorder:
             return
 
         if self.awaiting_trigger:
-            if self._pending_trigger == ("keyboard", normalized):
+            if self._pending_trigger == (DEVICE_KEYBOARD, normalized):
                 self._capture_trigger(f"keyboard_{normalized}")
             return
 
         if not normalized:
             return
 
+        self._pressed.discard((DEVICE_KEYBOARD, normalized))
+        self._record_action(DEVICE_KEYBOARD, ACTION_RELEASE, normalized)
+
+    def _on_mouse_move(self, x, y):
+        if not self.recording or self.awaiting_trigger:
+            return
         event_time = self._event_time()
-        self._pending_actions.pop(("keyboard", normalized), None)
-        event = {"kind": "event", "time": event_time, "type": "keyboard", "action": "release", "key": normalized}
-        self._record_action(event, event_time)
+        with self._journal_lock:
+            journal = self._journal
+            if not journal:
+                return
+            if event_time - self._last_move_time < MOVE_SAMPLE_INTERVAL:
+                self._pending_move = (event_time, int(x), int(y))
+                return
+            self._last_move_time = event_time
+            self._pending_move = None
+            journal.append(event_time, DEVICE_MOUSE, ACTION_MOVE, (int(x), int(y)))
 
     def _on_mouse_click(self, x, y, button, pressed):
         if not self.recording:
@@ -247,64 +294,20 @@ class InputRecorder:
 
         if self.awaiting_trigger:
             if pressed:
-                self._pending_trigger = ("mouse", button_name)
-            elif self._pending_trigger == ("mouse", button_name):
+                self._pending_trigger = (DEVICE_MOUSE, button_name)
+            elif self._pending_trigger == (DEVICE_MOUSE, button_name):
                 self._capture_trigger(f"mouse_{button_name}")
             return
 
-        event_time = self._event_time()
-        action = "press" if pressed else "release"
-        pending_key = ("mouse", button_name)
+        pressed_key = (DEVICE_MOUSE, button_name)
         if pressed:
-            if pending_key in self._pending_actions:
+            if pressed_key in self._pressed:
                 return
-            event = {"kind": "event", "time": event_time, "type": "mouse", "action": action, "key": button_name}
-            self._pending_actions[pending_key] = (event, event_time)
+            self._pressed.add(pressed_key)
+            self._record_action(DEVICE_MOUSE, ACTION_PRESS, button_name)
         else:
-            self._pending_actions.pop(pending_key, None)
-            event = {"kind": "event", "time": event_time, "type": "mouse", "action": action, "key": button_name}
-        self._record_action(event, event_time)
-
-    def _build_actions(self) -> list[dict]:
-        result: list[dict] = []
-        idx = 0
-        while idx < len(self._events):
-            event = self._events[idx]
-            if event["kind"] == "delay":
-                duration = round(event["duration"], 3)
-                if duration > 0:
-                    result.append({"type": "delay", "duration": duration})
-                idx += 1
-                continue
-
-            next_event = None
-            next_idx = -1
-            interstitial_delay = None
-            if idx + 2 < len(self._events) and self._events[idx + 1]["kind"] == "delay" and self._events[idx + 2]["kind"] == "event":
-                interstitial_delay = self._events[idx + 1]
-                next_event = self._events[idx + 2]
-                next_idx = idx + 2
-            elif idx + 1 < len(self._events) and self._events[idx + 1]["kind"] == "event":
-                next_event = self._events[idx + 1]
-                next_idx = idx + 1
-
-            if (
-                next_event
-                and event["type"] == next_event["type"]
-                and event["key"] == next_event["key"]
-                and event["action"] == "press"
-                and next_event["action"] == "release"
-            ):
-                gap_seconds = interstitial_delay["duration"] if interstitial_delay else (next_event["time"] - event["time"])
-                if gap_seconds < CLICK_MERGE_THRESHOLD_SECONDS:
-                    result.append({"type": event["type"], "action": "click", "key": event["key"]})
-                    idx = next_idx + 1
-                    continue
-
-            result.append({"type": event["type"], "action": event["action"], "key": event["key"]})
-            idx += 1
-
-        return result
+            self._pressed.discard(pressed_key)
+            self._record_action(DEVICE_MOUSE, ACTION_RELEASE, button_name)
 
 
 class MainWindow:
@@ -313,7 +316,7 @@ class MainWindow:
         self.root.title("TriggerAutoInput GUI")
         self.project_root = get_app_root()
         self.log_queue: queue.Queue = queue.Queue()
-        self.manager: AutoInputManager | None = None
+        self.manager: "AutoInputManager | None" = None
         self.worker_thread: threading.Thread | None = None
         self.process_dump_thread: threading.Thread | None = None
         self.want_close = False
@@ -321,7 +324,9 @@ class MainWindow:
         self.status_var = tk.StringVar(value="空闲")
         self.config_var = tk.StringVar(value=self._get_default_config_value())
         self.log_var = tk.BooleanVar(value=False)
+        self.stats_var = tk.BooleanVar(value=False)
         self.process_var = tk.StringVar(value="")
+        self.record_moves_var = tk.BooleanVar(value=False)
         self.recorder = InputRecorder(
             root=self.root,
             log_callback=self._queue_log,
@@ -332,6 +337,7 @@ class MainWindow:
 
         self._build_ui()
         self.root.protocol("WM_DELETE_WINDOW", self._on_close)
+        self._recover_recording()
         self._poll_logs()
 
     def _build_ui(self):
@@ -349,7 +355,10 @@ class MainWindow:
         self.browse_button.grid(row=0, column=2, sticky=tk.W, padx=(4, 0))
 
         ttk.Label(param_frame, text="启用日志:").grid(row=1, column=0, sticky=tk.W, pady=(8, 0))
-        ttk.Checkbutton(param_frame, variable=self.log_var).grid(row=1, column=1, sticky=tk.W, pady=(8, 0))
+        option_frame = ttk.Frame(param_frame)
+        option_frame.grid(row=1, column=1, sticky=tk.W, pady=(8, 0))
+        ttk.Checkbutton(option_frame, variable=self.log_var).pack(side=tk.LEFT)
+        ttk.Checkbutton(option_frame, text="统计延迟（停止时输出）", variable=self.stats_var).pack(side=tk.LEFT, padx=(12, 0))
 
         ttk.Label(param_frame, text="进程名 (可选):").grid(row=2, column=0, sticky=tk.W, pady=(8, 0))
         self.process_entry = ttk.Entry(param_frame, textvariable=self.process_var, width=40)
@@ -361,6 +370,7 @@ class MainWindow:
         record_frame.pack(fill=tk.X)
         self.record_button = ttk.Button(record_frame, text="开始录制", command=self._toggle_recording)
         self.record_button.pack(side=tk.LEFT)
+        ttk.Checkbutton(record_frame, text="录制鼠标移动", variable=self.record_moves_var).pack(side=tk.LEFT, padx=(12, 0))
         ttk.Label(
             record_frame,
             text=f"录制输出固定覆盖到 {RECORD_OUTPUT_PATH}，结束快捷键 Ctrl+Shift+C",
@@ -428,7 +438,7 @@ class MainWindow:
             messagebox.showwarning("无法录制", "请先停止当前运行中的监听，再开始录制。")
             return
 
-        started = self.recorder.start()
+        started = self.recorder.start(record_moves=self.record_moves_var.get())
         if not started:
             return
         self.record_button.configure(text="停止录制")
@@ -438,7 +448,23 @@ class MainWindow:
         self.record_button.configure(text="开始录制")
         if payload is None:
             return
+        if self._save_recording(payload):
+            self.status_var.set("录制完成")
+
+    def _recover_recording(self):
+        """上次录制过程中程序意外退出时，从残留的录制日志恢复配置"""
+        if not os.path.isfile(self.recorder.journal_path):
+            return
+        try:
+            payload, _ignored = journal_to_config(self.recorder.journal_path, CLICK_MERGE_THRESHOLD_SECONDS)
+        except Exception as exc:
+            self._queue_log(f"恢复上次录制失败: {exc}")
+            self.recorder.discard_journal()
+            return
+        self._queue_log("发现上次未正常结束的录制，已从录制日志恢复")
+        self._save_recording(payload)
 
+    def _save_recording(self, payload: dict) -> bool:
         process_name = self.process_var.get()
         if process_name:
             payload["process"] = process_name
@@ -448,15 +474,17 @@ class MainWindow:
         try:
             with open(output_path, "w", encoding="utf-8") as file:
                 json.dump(payload, file, ensure_ascii=False, indent=4)
+            self.recorder.discard_journal()
             self.config_var.set(self._to_display_path(output_path))
-            self.status_var.set("录制完成")
             trigger_key = next(iter(payload))
             action_count = len(payload[trigger_key]["actions"])
             self._queue_log(f"录制完成：触发键 {trigger_key}，共生成 {action_count} 个动作")
             self._queue_log(f"配置已覆盖写入：{output_path}")
+            return True
         except Exception as exc:
             self.status_var.set("录制保存失败")
             self._queue_log(f"保存录制配置失败: {exc}")
+            return False
 
     def _on_print_processes(self):
         if self.process_dump_thread and self.process_dump_thread.is_alive():
@@ -470,6 +498,9 @@ class MainWindow:
 
     def _dump_processes_worker(self):
         try:
+            import ctypes
+            import psutil
+
             window_rows: list[tuple[str, int, str, str, str]] = []
             unique_names: set[str] = set()
 
@@ -559,7 +590,22 @@ class MainWindow:
             return
         self.config_var.set(self._to_display_path(abs_config))
 
-        manager = AutoInputManager(abs_config, self.log_var.get(), process_name=self.process_var.get() or None)
+        from auto_input_manager import AutoInputManager
+        from config_compiler import ConfigError
+        try:
+            manager = AutoInputManager(
+                abs_config,
+                self.log_var.get(),
+                process_name=self.process_var.get() or None,
+                log_sinks=[self._queue_log],
+                collect_metrics=self.stats_var.get(),
+            )
+        except ConfigError as exc:
+            messagebox.showerror("配置文件无效", str(exc))
+            return
+        except Exception as exc:
+            messagebox.showerror("加载配置文件失败", str(exc))
+            return
         self.manager = manager
         self.action_text.set("停止")
         self.status_var.set("运行中")
@@ -577,7 +623,7 @@ class MainWindow:
         except Exception as exc:
             self._queue_log(f"停止失败: {exc}")
 
-    def _run_manager(self, manager: AutoInputManager):
+    def _run_manager(self, manager: "AutoInputManager"):
         try:
             with PrintForwarder(self.log_queue):
                 manager.start()
@@ -595,18 +641,35 @@ class MainWindow:
             self.root.destroy()
 
     def _poll_logs(self):
-        at_bottom = self.log_text.yview()[1] >= 0.99
-        while True:
+        # 只取出本次轮询开始时已积压的日志，避免在持续写入时无法返回
+        pending = self.log_queue.qsize()
+        # 队列中的一项可能是日志管线批量输出的多行文本，按行计数与裁剪
+        lines: collections.deque[str] = collections.deque(maxlen=LOG_MAX_LINES_PER_POLL)
+        received = 0
+        for _ in range(pending):
             try:
                 message = self.log_queue.get_nowait()
             except queue.Empty:
                 break
+            batch = message.splitlines(keepends=True)
+            lines.extend(batch)
+            received += len(batch)
+
+        if lines:
+            suppressed = received - len(lines)
+            text = "".join(lines)
+            if suppressed:
+                text = f"... 日志过多，已省略 {suppressed} 行\n" + text
+            at_bottom = self.log_text.yview()[1] >= 0.99
             self.log_text.config(state=tk.NORMAL)
-            self.log_text.insert(tk.END, message)
+            self.log_text.insert(tk.END, text)
+            line_count = int(self.log_text.index("end-1c").split(".")[0])
+            if line_count > LOG_MAX_LINES:
+                self.log_text.delete("1.0", f"{line_count - LOG_MAX_LINES + 1}.0")
             self.log_text.config(state=tk.DISABLED)
             if at_bottom:
                 self.log_text.yview_moveto(1.0)
-        self.root.after(100, self._poll_logs)
+        self.root.after(LOG_POLL_INTERVAL_MS, self._poll_logs)
 
     def _on_close(self):
         if self.recorder.recording:
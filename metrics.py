@@ -0,0 +1,112 @@
+"""延迟与抖动统计：按触发器记录固定内存的对数-线性（HDR 风格）直方图。
+
+每个直方图以纳秒为单位分桶：小于 2^SUB_BITS 的值逐个计数，更大的值在每个 2 的幂区间内
+再均分为 2^(SUB_BITS-1) 个子桶，相对误差约 3%，最大可记录约 1100 秒，超出部分计入最后一个桶。
+"""
+import threading
+from array import array
+from typing import Dict, List
+
+SUB_BITS = 6
+_SUB_COUNT = 1 << SUB_BITS
+_SUB_HALF = _SUB_COUNT >> 1
+_MAX_BIT_LENGTH = 40
+BUCKET_COUNT = (_MAX_BIT_LENGTH - SUB_BITS) * _SUB_HALF + _SUB_COUNT
+
+
+def _bucket_bounds(index: int):
+    """返回桶的 [下界, 上界] 纳秒值"""
+    if index < _SUB_COUNT:
+        return index, index
+    shift = index // _SUB_HALF - 1
+    mantissa = index - shift * _SUB_HALF
+    return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    __slots__ = ('counts', 'count', 'max_ns')
+
+    def __init__(self):
+        self.counts = array('Q', bytes(8 * BUCKET_COUNT))
+        self.count = 0
+        self.max_ns = 0
+
+    def record(self, seconds: float):
+        value = int(seconds * 1e9)
+        if value < _SUB_COUNT:
+            index = value if value > 0 else 0
+        else:
+            shift = value.bit_length() - SUB_BITS
+            index = shift * _SUB_HALF + (value >> shift)
+            if index >= BUCKET_COUNT:
+                index = BUCKET_COUNT - 1
+        self.counts[index] += 1
+        self.count += 1
+        if value > self.max_ns:
+            self.max_ns = value
+
+    def percentile(self, q: float) -> float:
+        """返回 q (0~1) 分位的近似值，单位为秒"""
+        if not self.count:
+            return 0.0
+        target = max(1, int(self.count * q + 0.5))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if not count:
+                continue
+            seen += count
+            if seen >= target:
+                low, high = _bucket_bounds(index)
+                return min((low + high) / 2, self.max_ns) / 1e9
+        return self.max_ns / 1e9
+
+    @property
+    def max(self) -> float:
+        return self.max_ns / 1e9
+
+
+class TriggerMetrics:
+    """单个触发器的各项统计"""
+    __slots__ = ('hook_to_handler', 'handler_to_injection', 'action', 'loop_period')
+
+    LABELS = (
+        ('hook_to_handler', '钩子回调->处理'),
+        ('handler_to_injection', '处理->首次注入'),
+        ('action', '单个动作耗时'),
+        ('loop_period', '循环周期'),
+    )
+
+    def __init__(self):
+        self.hook_to_handler = LatencyHistogram()
+        self.handler_to_injection = LatencyHistogram()
+        self.action = LatencyHistogram()
+        self.loop_period = LatencyHistogram()
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._triggers: Dict[str, TriggerMetrics] = {}
+        self._lock = threading.Lock()
+
+    def for_trigger(self, name: str) -> TriggerMetrics:
+        metrics = self._triggers.get(name)
+        if metrics is None:
+            with self._lock:
+                metrics = self._triggers.setdefault(name, TriggerMetrics())
+        return metrics
+
+    def report(self) -> List[str]:
+        """按触发器输出 p50/p99/max，单位为毫秒"""
+        lines = []
+        for name in sorted(self._triggers):
+            metrics = self._triggers[name]
+            lines.append(f'[统计] {name}')
+            for attr, label in TriggerMetrics.LABELS:
+                histogram = getattr(metrics, attr)
+                if not histogram.count:
+                    continue
+                lines.append(f'  {label}: n={histogram.count} '
+                             f'p50={histogram.percentile(0.5) * 1000:.3f}ms '
+                             f'p99={histogram.percentile(0.99) * 1000:.3f}ms '
+                             f'max={histogram.max * 1000:.3f}ms')
+        return lines
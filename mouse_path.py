@@ -0,0 +1,113 @@
+"""鼠标平滑移动路径：在编译配置时一次性生成路径上每一步的坐标，运行时只按间隔依次发送。
+
+路径为二次贝塞尔曲线（curve 为 0 时即直线），按 easing 曲线分配进度；
+jitter 为每个中间点叠加的均匀随机偏移（像素），一次生成 JITTER_VARIANTS 条不同抖动的路径，
+执行时随机选用其中一条，终点始终精确落在目标位置。
+
+安装了 numpy（可选依赖 speedups，发布版默认包含）时用向量化计算（包括整批抽取随机抖动），
+否则回退到逐点的纯 Python 实现。
+生成结果统一转换为 int 元组，以便写入编译缓存。
+"""
+import random
+from typing import Tuple
+
+# 平滑移动默认的发送间隔，单位为秒
+DEFAULT_MOVE_INTERVAL = 0.01
+# 单条路径允许的最大步数，避免极长的 duration 生成过大的路径
+MAX_PATH_STEPS = 10000
+# 启用 jitter 时预生成的路径数量
+JITTER_VARIANTS = 16
+
+EASINGS = ('linear', 'ease_in', 'ease_out', 'ease_in_out')
+
+Point = Tuple[int, int]
+
+
+def _ease(name: str, t: float) -> float:
+    if name == 'ease_in':
+        return t * t
+    if name == 'ease_out':
+        return t * (2 - t)
+    if name == 'ease_in_out':
+        return 3 * t * t - 2 * t * t * t
+    return t
+
+
+def _control_point(start: Tuple[float, float], end: Tuple[float, float], curve: float) -> Tuple[float, float]:
+    """贝塞尔控制点：线段中点沿法线方向偏移 curve 倍的线段长度"""
+    (x0, y0), (x1, y1) = start, end
+    dx, dy = x1 - x0, y1 - y0
+    return (x0 + x1) / 2 - dy * curve, (y0 + y1) / 2 + dx * curve
+
+
+def _path_numpy(np, start, end, steps: int, easing: str, curve: float, jitter: float, variants: int,
+                relative: bool):
+    t = np.arange(1, steps + 1, dtype=np.float64) / steps
+    if easing == 'ease_in':
+        e = t * t
+    elif easing == 'ease_out':
+        e = t * (2 - t)
+    elif easing == 'ease_in_out':
+        e = t * t * (3 - 2 * t)
+    else:
+        e = t
+    p0 = np.array(start, dtype=np.float64)
+    p1 = np.array(_control_point(start, end, curve), dtype=np.float64)
+    p2 = np.array(end, dtype=np.float64)
+    u = (1 - e)[:, None]
+    e = e[:, None]
+    points = u * u * p0 + 2 * u * e * p1 + e * e * p2
+    if jitter:
+        offsets = np.random.default_rng().uniform(-jitter, jitter, size=(variants, steps, 2))
+        offsets[:, -1] = 0
+        points = points[None, :, :] + offsets
+    else:
+        points = points[None, :, :]
+    points = np.rint(points).astype(np.int64)
+    if relative:
+        origin = np.broadcast_to(np.array(start, dtype=np.int64), (points.shape[0], 1, 2))
+        points = np.diff(points, axis=1, prepend=origin)
+    return [tuple(map(tuple, path)) for path in points.tolist()]
+
+
+def _path_python(start, end, steps: int, easing: str, curve: float, jitter: float, variants: int,
+                 relative: bool):
+    (x0, y0), (x1, y1) = start, end
+    cx, cy = _control_point(start, end, curve)
+    base = []
+    for step in range(1, steps + 1):
+        e = _ease(easing, step / steps)
+        u = 1 - e
+        base.append((u * u * x0 + 2 * u * e * cx + e * e * x1, u * u * y0 + 2 * u * e * cy + e * e * y1))
+    result = []
+    for _ in range(variants if jitter else 1):
+        path = []
+        last_x, last_y = start
+        for index, (x, y) in enumerate(base):
+            if jitter and index < steps - 1:
+                x += random.uniform(-jitter, jitter)
+                y += random.uniform(-jitter, jitter)
+            x, y = round(x), round(y)
+            path.append((x - last_x, y - last_y) if relative else (x, y))
+            last_x, last_y = x, y
+        result.append(tuple(path))
+    return result
+
+
+def build_path(start: Point, end: Point, duration: float, interval: float = DEFAULT_MOVE_INTERVAL,
+               easing: str = 'linear', curve: float = 0.0, jitter: float = 0.0,
+               relative: bool = False) -> Tuple[Tuple[Point, ...], ...]:
+    """生成从 start 到 end 的路径，返回若干条等长路径，每条为 duration/interval 个点。
+
+    relative 为 True 时每个点是相对上一个点的位移（start 应为 (0, 0)），
+    位移由取整后的绝对坐标差分得到，累计之和与 end - start 完全一致。
+    """
+    steps = min(MAX_PATH_STEPS, max(1, round(duration / interval)))
+    variants = JITTER_VARIANTS if jitter else 1
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+    if np is not None:
+        return tuple(_path_numpy(np, start, end, steps, easing, curve, jitter, variants, relative))
+    return tuple(_path_python(start, end, steps, easing, curve, jitter, variants, relative))
@@ -0,0 +1,252 @@
+"""输出后端：AutoInputManager 通过它发送所有键鼠注入事件。
+
+- PyDirectInputBackend: 默认后端，调用 pydirectinput 向系统注入输入
+- NullBackend: 丢弃所有事件
+- RecordingBackend: 只在内存中记录带时间戳的事件，可在没有桌面环境的机器上运行基准测试
+
+send_batch 接收 (事件码, 键名) 序列并按顺序一次性发送，事件码为下面的 EV_* 常量；
+EV_MOUSE_MOVE 事件的键名位置为屏幕绝对坐标 (x, y)，EV_MOUSE_MOVE_REL 为相对位移 (dx, dy)。
+"""
+import time
+from typing import Callable, List, Sequence, Tuple
+
+EV_KEY_DOWN = 0
+EV_KEY_UP = 1
+EV_KEY_CLICK = 2
+EV_MOUSE_DOWN = 3
+EV_MOUSE_UP = 4
+EV_MOUSE_CLICK = 5
+EV_MOUSE_MOVE = 6
+EV_MOUSE_MOVE_REL = 7
+
+
+class OutputBackend:
+    """输出后端接口，key 为 pydirectinput 的键名，button 为鼠标按键名"""
+
+    def key_down(self, key: str):
+        raise NotImplementedError
+
+    def key_up(self, key: str):
+        raise NotImplementedError
+
+    def key_click(self, key: str):
+        raise NotImplementedError
+
+    def mouse_down(self, button: str):
+        raise NotImplementedError
+
+    def mouse_up(self, button: str):
+        raise NotImplementedError
+
+    def mouse_click(self, button: str):
+        raise NotImplementedError
+
+    def mouse_move(self, position: Tuple[int, int]):
+        """把鼠标移动到屏幕绝对坐标 position = (x, y)"""
+        raise NotImplementedError
+
+    def mouse_move_rel(self, delta: Tuple[int, int]):
+        """把鼠标相对当前位置移动 delta = (dx, dy)"""
+        raise NotImplementedError
+
+    def send_batch(self, events: Sequence[Tuple[int, str]]):
+        """按顺序发送一批事件，默认逐个调用对应的方法"""
+        handlers = (self.key_down, self.key_up, self.key_click, self.mouse_down, self.mouse_up, self.mouse_click,
+                    self.mouse_move, self.mouse_move_rel)
+        for code, key in events:
+            handlers[code](key)
+
+
+class PyDirectInputBackend(OutputBackend):
+    # pydirectinput 为方向键附加扩展键标志，NumLock 打开时还需额外发送 0xE0 扫描码
+    ARROW_KEYS = frozenset(['up', 'left', 'down', 'right'])
+
+    def __init__(self):
+        # pydirectinput 只能在 Windows 上导入，延迟到实际使用该后端时；ctypes 同样只有该后端需要
+        import ctypes
+        import pydirectinput
+        self._ctypes = ctypes
+        self._pdi = pydirectinput
+        self._extra = ctypes.c_ulong(0)
+        self._mouse_flags = {
+            'left': (pydirectinput.MOUSEEVENTF_LEFTDOWN, pydirectinput.MOUSEEVENTF_LEFTUP),
+            'middle': (pydirectinput.MOUSEEVENTF_MIDDLEDOWN, pydirectinput.MOUSEEVENTF_MIDDLEUP),
+            'right': (pydirectinput.MOUSEEVENTF_RIGHTDOWN, pydirectinput.MOUSEEVENTF_RIGHTUP),
+        }
+
+    def key_down(self, key: str):
+        self._pdi.keyDown(key, _pause=False)
+
+    def key_up(self, key: str):
+        self._pdi.keyUp(key, _pause=False)
+
+    def key_click(self, key: str):
+        self._pdi.press(key, _pause=False)
+
+    def mouse_down(self, button: str):
+        self._pdi.mouseDown(button=button, _pause=False)
+
+    def mouse_up(self, button: str):
+        self._pdi.mouseUp(button=button, _pause=False)
+
+    def mouse_click(self, button: str):
+        self._pdi.click(button=button, _pause=False)
+
+    def mouse_move(self, position: Tuple[int, int]):
+        self._pdi.moveTo(position[0], position[1], _pause=False)
+
+    def mouse_move_rel(self, delta: Tuple[int, int]):
+        # 直接发送相对位移，不先读取当前坐标，适合游戏内的视角移动；与 send_batch 使用同一编码
+        self._pdi.failSafeCheck()
+        self._send_inputs([self._mouse_input(self._pdi.MOUSEEVENTF_MOVE, delta[0], delta[1])])
+
+    def _key_input(self, scan_code: int, flags: int):
+        pdi = self._pdi
+        ctypes = self._ctypes
+        ii_ = pdi.Input_I()
+        ii_.ki = pdi.KeyBdInput(0, scan_code, pdi.KEYEVENTF_SCANCODE | flags, 0, ctypes.pointer(self._extra))
+        return pdi.Input(ctypes.c_ulong(1), ii_)
+
+    def _mouse_input(self, flags: int, x: int = 0, y: int = 0):
+        pdi = self._pdi
+        ctypes = self._ctypes
+        ii_ = pdi.Input_I()
+        ii_.mi = pdi.MouseInput(x, y, 0, flags, 0, ctypes.pointer(self._extra))
+        return pdi.Input(ctypes.c_ulong(0), ii_)
+
+    def _send_inputs(self, inputs: list):
+        if inputs:
+            pdi = self._pdi
+            array = (pdi.Input * len(inputs))(*inputs)
+            pdi.SendInput(len(inputs), array, self._ctypes.sizeof(pdi.Input))
+
+    def send_batch(self, events: Sequence[Tuple[int, str]]):
+        """把整批事件编码为 INPUT 数组，通过一次 SendInput 调用注入
+
+        绝对坐标移动与单独注入时一样交给 pydirectinput.moveTo（坐标换算与多显示器处理由它负责），
+        此时先发送已编码的事件，再继续编码之后的事件。
+        """
+        pdi = self._pdi
+        ctypes = self._ctypes
+        pdi.failSafeCheck()
+        keyup = pdi.KEYEVENTF_KEYUP
+        inputs = []
+        numlock = None
+        for code, key in events:
+            if code == EV_MOUSE_MOVE:
+                self._send_inputs(inputs)
+                inputs = []
+                self.mouse_move(key)
+                continue
+            if code == EV_MOUSE_MOVE_REL:
+                inputs.append(self._mouse_input(pdi.MOUSEEVENTF_MOVE, key[0], key[1]))
+                continue
+            if code >= EV_MOUSE_DOWN:
+                flags = self._mouse_flags.get(key)
+                if flags is None:
+                    raise ValueError(f'pydirectinput 不支持的鼠标按键: {key}')
+                if code == EV_MOUSE_DOWN:
+                    inputs.append(self._mouse_input(flags[0]))
+                elif code == EV_MOUSE_UP:
+                    inputs.append(self._mouse_input(flags[1]))
+                else:
+                    inputs.append(self._mouse_input(flags[0] | flags[1]))
+                continue
+
+            if code == EV_KEY_CLICK and len(key) > 1:
+                key = key.lower()
+            scan_code = pdi.KEYBOARD_MAPPING.get(key)
+            if scan_code is None:
+                continue
+            flags = 0
+            prefix = False
+            if key in self.ARROW_KEYS:
+                flags = pdi.KEYEVENTF_EXTENDEDKEY
+                if numlock is None:
+                    numlock = bool(ctypes.windll.user32.GetKeyState(0x90))
+                prefix = numlock
+            if code != EV_KEY_UP:
+                if prefix:
+                    inputs.append(self._key_input(0xE0, 0))
+                inputs.append(self._key_input(scan_code, flags))
+            if code != EV_KEY_DOWN:
+                inputs.append(self._key_input(scan_code, flags | keyup))
+                if prefix:
+                    inputs.append(self._key_input(0xE0, keyup))
+
+        self._send_inputs(inputs)
+
+
+class NullBackend(OutputBackend):
+    def key_down(self, key: str):
+        pass
+
+    def key_up(self, key: str):
+        pass
+
+    def key_click(self, key: str):
+        pass
+
+    def mouse_down(self, button: str):
+        pass
+
+    def mouse_up(self, button: str):
+        pass
+
+    def mouse_click(self, button: str):
+        pass
+
+    def mouse_move(self, position: Tuple[int, int]):
+        pass
+
+    def mouse_move_rel(self, delta: Tuple[int, int]):
+        pass
+
+    def send_batch(self, events: Sequence[Tuple[int, str]]):
+        pass
+
+
+class RecordingBackend(OutputBackend):
+    """记录 (时间戳, 事件名, 键名) 的内存后端，批量发送的事件共用同一时间戳
+
+    时间戳默认为 perf_counter，模拟回放时传入虚拟时钟。
+    """
+
+    EVENT_NAMES = ('key_down', 'key_up', 'key_click', 'mouse_down', 'mouse_up', 'mouse_click', 'mouse_move',
+                   'mouse_move_rel')
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        self.events: List[Tuple[float, str, str]] = []
+        self._clock = clock
+
+    def clear(self):
+        self.events = []
+
+    def key_down(self, key: str):
+        self.events.append((self._clock(), 'key_down', key))
+
+    def key_up(self, key: str):
+        self.events.append((self._clock(), 'key_up', key))
+
+    def key_click(self, key: str):
+        self.events.append((self._clock(), 'key_click', key))
+
+    def mouse_down(self, button: str):
+        self.events.append((self._clock(), 'mouse_down', button))
+
+    def mouse_up(self, button: str):
+        self.events.append((self._clock(), 'mouse_up', button))
+
+    def mouse_click(self, button: str):
+        self.events.append((self._clock(), 'mouse_click', button))
+
+    def mouse_move(self, position: Tuple[int, int]):
+        self.events.append((self._clock(), 'mouse_move', position))
+
+    def mouse_move_rel(self, delta: Tuple[int, int]):
+        self.events.append((self._clock(), 'mouse_move_rel', delta))
+
+    def send_batch(self, events: Sequence[Tuple[int, str]]):
+        now = self._clock()
+        names = self.EVENT_NAMES
+        self.events.extend((now, names[code], key) for code, key in events)
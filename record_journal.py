@@ -0,0 +1,318 @@
+"""录制日志：InputRecorder 把每个键鼠事件以定长二进制记录追加写入日志文件，而不是在内存中保存事件字典。
+
+文件格式：首行为 `TAIREC1 <触发键>\\n`，其后每条记录为 <时间(double) 设备(u8) 动作(u8) 键名长度(u8)> 加 UTF-8 键名；
+鼠标移动记录的键名位置为 <x(int32) y(int32)> 屏幕坐标。
+写入端每隔 FLUSH_INTERVAL 秒刷新一次，进程意外退出时最多丢失最后一小段；
+结束录制时 build_actions 对日志做流式遍历生成配置动作，内存占用只与同时按下的按键数量
+以及单段连续鼠标移动的采样点数有关。
+
+鼠标移动在监听端已按 MOVE_SAMPLE_INTERVAL 合并采样，生成配置前再对每段连续移动做
+Ramer–Douglas–Peucker 路径化简（像素容差）并把时间量化到 MOVE_TIME_QUANTUM，
+使几秒钟的移动只产生几十个 move 动作。
+
+最后 fold_repeats 把连续重复的动作序列（延时在容差内视为相同）折叠为 repeat 块，
+例如连按 200 次生成的 400 个动作只保留一份 [click, delay]。
+"""
+import collections
+import struct
+import threading
+import time
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+DEVICE_KEYBOARD = 0
+DEVICE_MOUSE = 1
+DEVICE_NAMES = ('keyboard', 'mouse')
+
+ACTION_PRESS = 0
+ACTION_RELEASE = 1
+ACTION_MOVE = 2
+ACTION_NAMES = ('press', 'release', 'move')
+
+# 日志刷新到磁盘的最长间隔，单位为秒
+FLUSH_INTERVAL = 0.5
+# 监听端鼠标移动的最小采样间隔，期间的移动只保留最新位置
+MOVE_SAMPLE_INTERVAL = 0.008
+# 路径化简的像素容差，偏离化简后折线不超过该距离的采样点会被去掉
+MOVE_TOLERANCE = 2.0
+# 移动动作之间的延时量化步长，单位为秒
+MOVE_TIME_QUANTUM = 0.01
+# 折叠重复时两个延时视为相同的容差：绝对差不超过该值，或不超过较大者的 REPEAT_DELAY_RATIO
+REPEAT_DELAY_TOLERANCE = 0.02
+REPEAT_DELAY_RATIO = 0.15
+# 折叠重复时尝试的最长循环体
+MAX_REPEAT_PERIOD = 32
+
+_MAGIC = b'TAIREC1'
+_RECORD = struct.Struct('<dBBB')
+_POSITION = struct.Struct('<ii')
+
+# (时间, 设备, 动作, 键名)；鼠标移动记录的键名为 (x, y)
+Record = Tuple[float, int, int, object]
+
+
+def journal_path(output_path: str) -> str:
+    return output_path + '.journal'
+
+
+class RecordJournal:
+    """录制日志的写入端，可被键盘、鼠标两个监听线程同时调用"""
+    __slots__ = ('path', 'count', '_file', '_lock', '_next_flush')
+
+    def __init__(self, path: str, trigger_key: str):
+        self.path = path
+        self.count = 0
+        self._file = open(path, 'wb')
+        self._lock = threading.Lock()
+        self._file.write(_MAGIC + b' ' + trigger_key.encode('utf-8') + b'\n')
+        self._file.flush()
+        self._next_flush = time.perf_counter() + FLUSH_INTERVAL
+
+    def append(self, event_time: float, device: int, action: int, key):
+        data = _POSITION.pack(*key) if action == ACTION_MOVE else key.encode('utf-8')
+        with self._lock:
+            self._file.write(_RECORD.pack(event_time, device, action, len(data)) + data)
+            self.count += 1
+            if event_time >= self._next_flush:
+                self._file.flush()
+                self._next_flush = event_time + FLUSH_INTERVAL
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def read_journal(path: str) -> Tuple[str, Iterator[Record]]:
+    """返回 (触发键, 记录迭代器)；文件末尾不完整的记录（写入中途进程退出）会被忽略"""
+    file = open(path, 'rb')
+    header = file.readline()
+    magic, _, trigger_key = header.rstrip(b'\n').partition(b' ')
+    if magic != _MAGIC or not trigger_key:
+        file.close()
+        raise ValueError(f'无效的录制日志: {path}')
+
+    def records() -> Iterator[Record]:
+        with file:
+            while True:
+                head = file.read(_RECORD.size)
+                if len(head) < _RECORD.size:
+                    return
+                event_time, device, action, length = _RECORD.unpack(head)
+                data = file.read(length)
+                if len(data) < length:
+                    return
+                key = _POSITION.unpack(data) if action == ACTION_MOVE else data.decode('utf-8')
+                yield event_time, device, action, key
+
+    return trigger_key.decode('utf-8'), records()
+
+
+def unclosed_presses(records: Iterable[Record]) -> set:
+    """返回录制结束时仍未松开的按下事件序号"""
+    pending = {}
+    for seq, (_time, device, action, key) in enumerate(records):
+        if action == ACTION_PRESS:
+            pending[(device, key)] = seq
+        elif action == ACTION_RELEASE:
+            pending.pop((device, key), None)
+    return set(pending.values())
+
+
+def _simplify_path(points: list, tolerance: float) -> list:
+    """Ramer–Douglas–Peucker：返回需要保留的点下标（升序），首尾两点总会保留"""
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    limit = tolerance * tolerance
+    while stack:
+        first, last = stack.pop()
+        x1, y1 = points[first]
+        x2, y2 = points[last]
+        dx, dy = x2 - x1, y2 - y1
+        length = dx * dx + dy * dy
+        farthest, max_distance = 0, limit
+        for index in range(first + 1, last):
+            px, py = points[index]
+            if length:
+                # 点到首尾连线距离的平方
+                cross = dx * (py - y1) - dy * (px - x1)
+                distance = cross * cross / length
+            else:
+                distance = (px - x1) ** 2 + (py - y1) ** 2
+            if distance > max_distance:
+                farthest, max_distance = index, distance
+        if farthest:
+            keep[farthest] = True
+            stack.append((first, farthest))
+            stack.append((farthest, last))
+    return [index for index, kept in enumerate(keep) if kept]
+
+
+def _reduce_moves(run: list, tolerance: float, quantum: float) -> list:
+    """化简一段连续的鼠标移动记录，并把时间量化为相对本段起点 quantum 的整数倍"""
+    if len(run) <= 2:
+        return run
+    kept = [run[index] for index in _simplify_path([record[3] for record in run], tolerance)]
+    start = run[0][0]
+    result = [kept[0]]
+    for record in kept[1:]:
+        event_time = start + round((record[0] - start) / quantum) * quantum
+        previous_time = result[-1][0]
+        if event_time <= previous_time and len(result) > 1:
+            # 量化后与上一个点落在同一时刻，只保留较新的位置
+            result[-1] = (previous_time,) + record[1:]
+        else:
+            result.append((max(event_time, previous_time),) + record[1:])
+    return result
+
+
+def simplify_moves(records: Iterable[Record], tolerance: float = MOVE_TOLERANCE,
+                   quantum: float = MOVE_TIME_QUANTUM) -> Iterator[Record]:
+    """流式化简：缓存每段连续的鼠标移动，遇到其他事件或结束时输出化简后的移动，其余记录原样输出"""
+    run = []
+    for record in records:
+        if record[2] == ACTION_MOVE:
+            run.append(record)
+            continue
+        if run:
+            yield from _reduce_moves(run, tolerance, quantum)
+            run = []
+        yield record
+    if run:
+        yield from _reduce_moves(run, tolerance, quantum)
+
+
+def _tokens(records: Iterable[Record], ignored: set):
+    """把记录展开为延时（float）与事件（记录元组）交替的序列，跳过 ignored 中的事件但保留其前后的延时"""
+    last_time = None
+    for seq, record in enumerate(records):
+        event_time = record[0]
+        if last_time is not None:
+            delay = event_time - last_time
+            if delay > 0:
+                yield delay
+        last_time = event_time
+        if seq not in ignored:
+            yield record
+
+
+def build_actions(records: Iterable[Record], merge_threshold: float, ignored: Optional[set] = None) -> List[dict]:
+    """流式生成配置动作：间隔小于 merge_threshold 的同键按下+松开合并为 click"""
+    tokens = _tokens(records, ignored or set())
+    window = collections.deque()
+    result = []
+
+    def fill():
+        while len(window) < 3:
+            token = next(tokens, None)
+            if token is None:
+                return
+            window.append(token)
+
+    fill()
+    while window:
+        token = window.popleft()
+        if isinstance(token, float):
+            duration = round(token, 3)
+            if duration > 0:
+                result.append({'type': 'delay', 'duration': duration})
+            fill()
+            continue
+
+        event_time, device, action, key = token
+        if action == ACTION_MOVE:
+            result.append({'type': 'mouse', 'action': 'move', 'x': key[0], 'y': key[1]})
+            fill()
+            continue
+        next_event = None
+        consumed = 0
+        gap = 0.0
+        if len(window) >= 2 and isinstance(window[0], float) and not isinstance(window[1], float):
+            next_event, gap, consumed = window[1], window[0], 2
+        elif window and not isinstance(window[0], float):
+            next_event, consumed = window[0], 1
+            gap = next_event[0] - event_time
+
+        if (next_event and action == ACTION_PRESS and next_event[2] == ACTION_RELEASE
+                and next_event[1] == device and next_event[3] == key and gap < merge_threshold):
+            result.append({'type': DEVICE_NAMES[device], 'action': 'click', 'key': key})
+            for _ in range(consumed):
+                window.popleft()
+        else:
+            result.append({'type': DEVICE_NAMES[device], 'action': ACTION_NAMES[action], 'key': key})
+        fill()
+    return result
+
+
+def _similar(a: dict, b: dict) -> bool:
+    if a.get('type') != b.get('type'):
+        return False
+    if a['type'] == 'delay':
+        x, y = a['duration'], b['duration']
+        return abs(x - y) <= max(REPEAT_DELAY_TOLERANCE, REPEAT_DELAY_RATIO * max(x, y))
+    if a['type'] == 'repeat':
+        return (a['count'] == b['count'] and len(a['actions']) == len(b['actions'])
+                and all(_similar(x, y) for x, y in zip(a['actions'], b['actions'])))
+    return a == b
+
+
+def _merge_copies(copies: List[List[dict]]) -> List[dict]:
+    """把若干份相似的动作序列合并为一份，延时取平均值"""
+    body = []
+    for items in zip(*copies):
+        first = items[0]
+        if first['type'] == 'delay':
+            body.append({'type': 'delay', 'duration': round(sum(item['duration'] for item in items) / len(items), 3)})
+        elif first['type'] == 'repeat':
+            body.append({'type': 'repeat', 'count': first['count'],
+                         'actions': _merge_copies([item['actions'] for item in items])})
+        else:
+            body.append(first)
+    return body
+
+
+def _fold_once(actions: List[dict]) -> Tuple[List[dict], bool]:
+    result = []
+    changed = False
+    i = 0
+    n = len(actions)
+    while i < n:
+        best = None
+        for period in range(1, min(MAX_REPEAT_PERIOD, (n - i) // 2) + 1):
+            count = 1
+            while (i + (count + 1) * period <= n
+                   and all(_similar(actions[i + k], actions[i + count * period + k]) for k in range(period))):
+                count += 1
+            # repeat 块本身算一个动作，至少要省下两个动作才折叠
+            saved = period * (count - 1) - 1
+            if saved >= 2 and (best is None or saved > best[0]):
+                best = (saved, period, count)
+        if best is None:
+            result.append(actions[i])
+            i += 1
+            continue
+        _saved, period, count = best
+        copies = [actions[i + c * period:i + (c + 1) * period] for c in range(count)]
+        # 循环体内部可能还有更短的重复
+        result.append({'type': 'repeat', 'count': count, 'actions': fold_repeats(_merge_copies(copies))})
+        i += period * count
+        changed = True
+    return result, changed
+
+
+def fold_repeats(actions: List[dict]) -> List[dict]:
+    """把连续重复的动作序列折叠为 repeat 块；多轮折叠可以得到嵌套的 repeat"""
+    changed = True
+    while changed:
+        actions, changed = _fold_once(actions)
+    return actions
+
+
+def journal_to_config(path: str, merge_threshold: float, fold: bool = True) -> Tuple[dict, int]:
+    """把录制日志转换为只含一个 once 触发器的配置，返回 (配置, 被忽略的未闭合按键数量)"""
+    _trigger_key, records = read_journal(path)
+    ignored = unclosed_presses(simplify_moves(records))
+    trigger_key, records = read_journal(path)
+    actions = build_actions(simplify_moves(records), merge_threshold, ignored)
+    if fold:
+        actions = fold_repeats(actions)
+    return {trigger_key: {'trigger_type': 'once', 'actions': actions}}, len(ignored)
@@ -41,7 +41,7 @@ New-Item -ItemType Directory -Path $exampleConfigStageDir -Force | Out-Null
 
 Push-Location $repoRoot
 try {
-    uv run pyinstaller `
+    uv run --extra speedups pyinstaller `
         --noconfirm `
         --clean `
         --onedir `
@@ -49,6 +49,7 @@ try {
         --name $appName `
         --windowed `
         --hidden-import _sha2 `
+        --hidden-import numpy `
         --exclude-module hashlib `
         --exclude-module _hashlib `
         mainWindow.py
@@ -0,0 +1,334 @@
+"""无界面的输入回放模拟器：把录制或合成的输入事件序列送入 AutoInputManager 的监听回调，
+用虚拟时钟驱动所有延时，并记录输出后端收到的事件。
+
+- 不安装系统钩子，也不导入 pynput：特殊键与鼠标按键使用 SimulatedKey / SimulatedButton 代替 pynput 的类型
+- 不启动调度线程：每个输入事件之前由 MacroScheduler.run_due 按截止时间顺序执行到期的激活，
+  虚拟时钟直接拨到截止时间，因此十分钟的会话可以在几百毫秒内回放完，且输出时间戳与运行环境无关
+- 与真实运行走同一套分发索引、修饰键、按键序列与宏调度代码，可以在 Linux CI 上对宏的时序做回归测试
+
+输入序列为 JSONL，每行一个事件：
+  {"t": 0.5, "device": "keyboard", "action": "press", "key": "f"}
+  {"t": 0.8, "device": "mouse", "action": "release", "key": "x1"}
+  {"t": 1.0, "device": "foreground", "key": "game1.exe"}
+t 为秒；keyboard 的 key 为单个字符或特殊键名（含 ctrl_l、shift 等修饰键），mouse 的 key 为鼠标按键名；
+foreground 事件切换前台进程。也可以直接使用图形界面录制产生的 .journal 录制日志（鼠标移动会被忽略）。
+
+用法:
+  python simulator.py config/example.json trace.jsonl --out output.jsonl
+  python simulator.py config/example.json --synthetic 600
+"""
+import argparse
+import enum
+import json
+import random
+import sys
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from auto_input_manager import AutoInputManager, MODIFIER_KEYS
+from config_compiler import (MOD_ALT, MOD_CTRL, MOD_SHIFT, MOD_WIN, MOUSE_BUTTON, SPECIAL_KEYS, CompiledTrigger,
+                             parse_trigger_key)
+from foreground import ManualForegroundProvider
+from output_backend import RecordingBackend
+from record_journal import ACTION_MOVE, ACTION_NAMES, DEVICE_NAMES, read_journal
+
+# 单次回放最多执行的调度步数，防止没有延时的循环在同一虚拟时刻无限执行
+DEFAULT_MAX_STEPS = 10000000
+TRACE_DEVICES = frozenset(['keyboard', 'mouse', 'foreground'])
+TRACE_ACTIONS = frozenset(['press', 'release'])
+# 合成序列中按下组合键时使用的修饰键
+_MODIFIER_NAMES = ((MOD_CTRL, 'ctrl_l'), (MOD_SHIFT, 'shift_l'), (MOD_ALT, 'alt_l'), (MOD_WIN, 'cmd'))
+
+# 代替 pynput.keyboard.Key 与 pynput.mouse.Button
+SimulatedKey = enum.Enum('SimulatedKey', sorted(SPECIAL_KEYS | {name for name, _ in MODIFIER_KEYS}))
+SimulatedButton = enum.Enum('SimulatedButton', sorted(MOUSE_BUTTON))
+
+# (时间, 设备, 动作, 键名)
+TraceEvent = Tuple[float, str, str, str]
+
+
+class VirtualClock:
+    """只在调用方推进时前进的时钟，可作为 AutoInputManager 与 RecordingBackend 的 clock"""
+    __slots__ = ('now',)
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance_to(self, target: float) -> float:
+        """把时钟推进到 target（不会后退），返回当前时间"""
+        if target > self.now:
+            self.now = target
+        return self.now
+
+
+class SimulatedKeyCode:
+    """代替 pynput.keyboard.KeyCode：字符键的 char 与虚拟键码"""
+    __slots__ = ('char', 'vk')
+
+    def __init__(self, char: str):
+        self.char = char
+        upper = char.upper()
+        # 与 Windows 一致，字母与数字的虚拟键码为其大写 ASCII 码
+        self.vk = ord(upper) if upper.isascii() and upper.isalnum() else None
+
+
+class ReplayResult(NamedTuple):
+    inputs: int
+    # RecordingBackend 记录的 (虚拟时间, 事件名, 键名)
+    outputs: List[Tuple[float, str, object]]
+    # 回放结束时的虚拟时间，单位为秒
+    virtual_time: float
+    wall_time: float
+    # 调度器执行的步数（每步执行到下一个延时或结束）
+    steps: int
+    # 是否因超过 max_steps 而停止执行宏
+    truncated: bool
+
+    @property
+    def events_per_second(self) -> float:
+        return self.inputs / self.wall_time if self.wall_time > 0 else 0.0
+
+
+def _check_event(event: TraceEvent, where: str) -> TraceEvent:
+    event_time, device, action, key = event
+    if not isinstance(event_time, (int, float)) or event_time < 0:
+        raise ValueError(f'{where}: t 必须是非负数')
+    if device not in TRACE_DEVICES:
+        raise ValueError(f'{where}: 不支持的设备 {device!r}')
+    if not isinstance(key, str) or not key:
+        raise ValueError(f'{where}: key 必须是非空字符串')
+    if device == 'foreground':
+        return float(event_time), device, 'press', key
+    if action not in TRACE_ACTIONS:
+        raise ValueError(f'{where}: 不支持的动作 {action!r}')
+    if device == 'mouse' and key not in MOUSE_BUTTON:
+        raise ValueError(f'{where}: 不支持的鼠标按键 {key!r}')
+    if device == 'keyboard' and len(key) != 1 and key not in SimulatedKey.__members__:
+        raise ValueError(f'{where}: 不支持的按键 {key!r}')
+    return float(event_time), device, action, key
+
+
+def _load_journal(path: str) -> List[TraceEvent]:
+    _trigger_key, records = read_journal(path)
+    events = []
+    origin = None
+    for event_time, device, action, key in records:
+        if action == ACTION_MOVE:
+            continue
+        if origin is None:
+            origin = event_time
+        events.append(_check_event((event_time - origin, DEVICE_NAMES[device], ACTION_NAMES[action], key),
+                                   f'{path} 第 {len(events) + 1} 个事件'))
+    return events
+
+
+def load_trace(path: str) -> List[TraceEvent]:
+    """读取 JSONL 输入序列或 .journal 录制日志，按时间排序返回"""
+    try:
+        return _load_journal(path)
+    except ValueError as e:
+        if '无效的录制日志' not in str(e):
+            raise
+    events = []
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            where = f'{path} 第 {line_number} 行'
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f'{where}: {e}') from None
+            if not isinstance(item, dict):
+                raise ValueError(f'{where}: 每行必须是一个对象')
+            events.append(_check_event((item.get('t'), item.get('device'), item.get('action'), item.get('key')),
+                                       where))
+    # 稳定排序，同一时刻的事件保持文件中的顺序
+    events.sort(key=lambda event: event[0])
+    return events
+
+
+def synthetic_trace(triggers: Dict[str, CompiledTrigger], duration: float, rate: float = 10.0,
+                    seed: int = 0, process_name: Optional[str] = None) -> List[TraceEvent]:
+    """按配置中的单键触发器生成输入序列：平均每秒 rate 次按键，约五分之一为未配置的按键
+
+    每次按键按住 20-300ms，组合键同时按下对应的修饰键；profile 中的触发器在按键前先切换前台进程，
+    顶层触发器在按键前切换回 process_name（未指定时为一个没有 profile 的进程）。
+    """
+    generator = random.Random(seed)
+    keys = []
+    for trigger in triggers.values():
+        device, modifiers, key = parse_trigger_key(trigger.trigger_key)
+        if device != 'combo':
+            keys.append((trigger.profile, device, modifiers, key))
+    # 未配置的按键不需要切换前台进程
+    noise = [(None, 'keyboard', 0, char) for char in '0123456789'
+             if not any(device == 'keyboard' and key == char for _, device, _, key in keys)]
+    home = process_name or 'explorer.exe'
+    foreground = home
+    events: List[TraceEvent] = []
+    now = 0.0
+    while True:
+        now += generator.expovariate(rate)
+        if now >= duration:
+            break
+        if noise and (not keys or generator.random() < 0.2):
+            profile, device, modifiers, key = generator.choice(noise)
+        else:
+            profile, device, modifiers, key = generator.choice(keys)
+        if profile is not None and (profile or home) != foreground:
+            foreground = profile or home
+            events.append((now, 'foreground', 'press', foreground))
+        release = now + generator.uniform(0.02, 0.3)
+        names = [name for bit, name in _MODIFIER_NAMES if modifiers & bit]
+        for name in names:
+            events.append((now, 'keyboard', 'press', name))
+        events.append((now, device, 'press', key))
+        events.append((release, device, 'release', key))
+        for name in names:
+            events.append((release, 'keyboard', 'release', name))
+        # 下一次按键在松开之后
+        now = release
+    return events
+
+
+class Simulator:
+    """用虚拟时钟驱动的 AutoInputManager，不启动调度线程与系统钩子"""
+
+    def __init__(self, config_path: str, process_name: Optional[str] = None, max_steps: int = DEFAULT_MAX_STEPS,
+                 seed: Optional[int] = 0):
+        self.clock = VirtualClock()
+        self.backend = RecordingBackend(self.clock)
+        self.foreground = ManualForegroundProvider()
+        self.max_steps = max_steps
+        # 随机延时与平滑移动路径的选择使用全局 random，固定种子使回放结果可重复
+        self.seed = seed
+        self.manager = AutoInputManager(config_path, False, process_name=process_name, backend=self.backend,
+                                        watch_config=False, use_cache=False, foreground_provider=self.foreground,
+                                        clock=self.clock, input_types=(SimulatedKey, SimulatedButton))
+        self.manager.start_engine(threaded=False)
+        if self.manager.process_name:
+            # 指定了进程时默认该进程在前台
+            self.foreground.set_foreground(self.manager.process_name)
+            self.manager.refresh_foreground()
+        self._key_codes: Dict[str, SimulatedKeyCode] = {}
+        self._steps = 0
+        self._truncated = False
+
+    def _run_until(self, target: float):
+        """执行截止时间不晚于 target 的激活，然后把时钟推进到 target"""
+        if not self._truncated:
+            steps, truncated = self.manager.scheduler.run_due(target, self.clock.advance_to,
+                                                              self.max_steps - self._steps)
+            self._steps += steps
+            self._truncated = truncated
+        self.clock.advance_to(target)
+
+    def _key(self, name: str):
+        if len(name) != 1:
+            return SimulatedKey[name]
+        key = self._key_codes.get(name)
+        if key is None:
+            key = self._key_codes[name] = SimulatedKeyCode(name)
+        return key
+
+    def feed(self, event: TraceEvent):
+        """在事件时间把一个输入事件送入对应的监听回调"""
+        event_time, device, action, key = event
+        self._run_until(event_time)
+        manager = self.manager
+        if device == 'keyboard':
+            if action == 'press':
+                manager.on_keyboard_press(self._key(key))
+            else:
+                manager.on_keyboard_release(self._key(key))
+        elif device == 'mouse':
+            manager.on_mouse_click(0, 0, SimulatedButton[key], action == 'press')
+        else:
+            self.foreground.set_foreground(key)
+            manager.refresh_foreground()
+
+    def replay(self, events: Iterable[TraceEvent], tail: float = 1.0) -> ReplayResult:
+        """依次回放 events，最后一个事件后再运行 tail 秒虚拟时间，返回本次回放的结果"""
+        if self.seed is not None:
+            random.seed(self.seed)
+        first_output = len(self.backend.events)
+        start_steps = self._steps
+        inputs = 0
+        start = time.perf_counter()
+        for event in events:
+            self.feed(event)
+            inputs += 1
+        self._run_until(self.clock.now + tail)
+        wall_time = time.perf_counter() - start
+        return ReplayResult(inputs, self.backend.events[first_output:], self.clock.now, wall_time,
+                            self._steps - start_steps, self._truncated)
+
+    def close(self):
+        """停止管理器，并执行被取消的循环以松开仍处于按下状态的按键"""
+        self.manager.stop()
+        self._run_until(self.clock.now)
+
+
+def write_outputs(path: str, outputs: Iterable[Tuple[float, str, object]]):
+    with open(path, 'w', encoding='utf-8') as f:
+        for event_time, event, key in outputs:
+            f.write(json.dumps({'t': round(event_time, 9), 'event': event, 'key': key}, ensure_ascii=False) + '\n')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='用虚拟时钟回放输入事件序列，输出注入事件与分发吞吐量',
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog='''
+示例:
+  python simulator.py config/example.json trace.jsonl  # 回放 JSONL 输入序列
+  python simulator.py config/example.json recorded.json.journal --out output.jsonl  # 回放录制日志并保存输出
+  python simulator.py config/example.json --synthetic 600  # 回放 10 分钟的合成输入
+''')
+    parser.add_argument('config', type=str, help='配置文件')
+    parser.add_argument('trace', type=str, nargs='?', default=None, help='JSONL 输入序列或 .journal 录制日志')
+    parser.add_argument('--synthetic', type=float, default=None, metavar='SECONDS',
+                        help='不读取输入序列，按配置生成指定时长的合成输入')
+    parser.add_argument('--rate', type=float, default=10.0, help='合成输入平均每秒按键次数')
+    parser.add_argument('--seed', type=int, default=0, help='合成输入与随机延时的随机种子')
+    parser.add_argument('--tail', type=float, default=1.0, help='最后一个输入事件之后继续运行的虚拟时间，单位为秒')
+    parser.add_argument('--out', type=str, default=None, help='把输出事件以 JSONL 写入该文件')
+    parser.add_argument('--max-steps', type=int, default=DEFAULT_MAX_STEPS, help='最多执行的调度步数')
+    parser.add_argument('-p', '--process', type=str, default=None, help='指定前台进程名，同 main.py')
+    args = parser.parse_args()
+    if (args.trace is None) == (args.synthetic is None):
+        parser.error('需要指定输入序列文件或 --synthetic 之一')
+    return args
+
+
+def main() -> int:
+    args = parse_args()
+    try:
+        simulator = Simulator(args.config, args.process, args.max_steps, args.seed)
+        if args.trace is not None:
+            events = load_trace(args.trace)
+        else:
+            events = synthetic_trace(simulator.manager.triggers, args.synthetic, args.rate, args.seed,
+                                     simulator.manager.process_name)
+    except Exception as e:
+        print(f'加载失败: {e}')
+        return 1
+
+    result = simulator.replay(events, args.tail)
+    print(f'输入事件 {result.inputs} 个, 输出事件 {len(result.outputs)} 个, 调度 {result.steps} 步')
+    print(f'虚拟时长 {result.virtual_time:.3f}s, 实际耗时 {result.wall_time * 1000:.2f}ms, '
+          f'分发吞吐量 {result.events_per_second:,.0f} 事件/秒')
+    if result.truncated:
+        print(f'警告: 调度步数超过 {args.max_steps}，之后的宏没有执行（可能存在没有延时的循环）')
+    if args.out:
+        write_outputs(args.out, result.outputs)
+        print(f'输出事件已写入 {args.out}')
+    simulator.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())